@@ -1,9 +1,21 @@
+import argparse
 import sys
-from pathlib import Path
 import time
 from datetime import datetime
-import numpy as np
+from pathlib import Path
 import pylsl
+# The settings below pick from these constants: BEAM_BACKEND (SDK, MOCK), LSL_ROTATION_LAYOUT
+# (LAYOUT_MATRIX, LAYOUT_QUATERNION, LAYOUT_EULER), LSL_PUSH_MODE (PUSH_SAMPLE, PUSH_CHUNK)
+# and FIXATION_METHOD (IVT, IDT), so every alternative is imported even while unused
+from beam_backend import BACKENDS, MOCK, SDK, load_backend
+from beam_mock import MOCK_RATES
+from beam_lsl import (LAYOUT_EULER, LAYOUT_MATRIX, LAYOUT_QUATERNION, LAYOUTS, PUSH_CHUNK, PUSH_SAMPLE,
+                      CLOCK_BLOCK_S, CLOCK_HISTORY_BLOCKS, GazeHeadPublisher, channel_names, clock_diagnostics,
+                      make_clock_outlet, make_outlet)
+from beam_events import IDT, IVT, FixationDetector, make_event_outlet, push_events
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))  # Shared modules in Data_Collection/
+from clock_sync import ClockMapper
 
 # ── CONFIG ──────────────────────────────────────────────
 FRIENDLY_NAME = "EngagementExperiment_LSL"
@@ -11,24 +23,36 @@ FRIENDLY_NAME = "EngagementExperiment_LSL"
 USE_UNIFIED_VIEWPORT = True
 SCREEN_WIDTH_PX = 1920
 SCREEN_HEIGHT_PX = 1080
-
-LSL_STREAM_NAME = "BeamEyeTracker_GazeHead_Matrix"
+SCREEN_WIDTH_M = 0.531        # Physical size, for degrees of visual angle (24" 16:9)
+SCREEN_HEIGHT_M = 0.299
+
+LSL_ROTATION_LAYOUT = LAYOUT_MATRIX  # LAYOUT_MATRIX: 16 ch (original), LAYOUT_QUATERNION: 11 ch, LAYOUT_EULER: 10 ch
+LSL_STREAM_NAMES = {
+    LAYOUT_MATRIX: "BeamEyeTracker_GazeHead_Matrix",
+    LAYOUT_QUATERNION: "BeamEyeTracker_GazeHead_Quaternion",
+    LAYOUT_EULER: "BeamEyeTracker_GazeHead_Euler",
+}
 LSL_STREAM_TYPE = "GazeHead"
 LSL_SOURCE_ID = "beam"
 LSL_NOMINAL_SRATE = 60.0
+LSL_PUSH_MODE = PUSH_SAMPLE   # PUSH_SAMPLE: lowest latency, PUSH_CHUNK: lowest CPU
+LSL_CHUNK_MS = 50.0           # Max age of a buffered sample in chunk mode (callback or timer flush)
+LSL_CLOCK_STREAM_NAME = "BeamEyeTracker_ClockSync"
+LSL_EVENT_STREAM_NAME = "BeamEyeTracker_Events"
+FIXATION_METHOD = IVT         # IVT: velocity threshold, IDT: dispersion threshold
+
+BEAM_BACKEND = SDK            # SDK: Eyeware Beam (Windows), MOCK: synthetic/recorded states (any OS)
 # ────────────────────────────────────────────────────────
 
-sdk_path = Path(__file__).parent / "beam_eye_tracker_sdk" / "beam_eye_tracker_sdk-2.1.0" / "python" / "package"
-sys.path.append(str(sdk_path))
-
-from eyeware.beam_eye_tracker import (
-    API,
-    ViewportGeometry,
-    Point,
-    TrackingListener,
-    NULL_DATA_TIMESTAMP,
-)
-def start_beam_stream():
+
+def start_beam_stream(backend, layout=LSL_ROTATION_LAYOUT):
+    API = backend.API
+    ViewportGeometry = backend.ViewportGeometry
+    Point = backend.Point
+    TrackingListener = backend.TrackingListener
+    NULL_DATA_TIMESTAMP = backend.NULL_DATA_TIMESTAMP
+    print(f"Tracker backend: {backend.name}")
+
     # Viewport
     if USE_UNIFIED_VIEWPORT:
         viewport = ViewportGeometry(Point(0.0, 0.0), Point(1.0, 1.0))
@@ -37,84 +61,56 @@ def start_beam_stream():
         viewport = ViewportGeometry(Point(0, 0), Point(SCREEN_WIDTH_PX, SCREEN_HEIGHT_PX))
         print(f"Using pixel viewport: {SCREEN_WIDTH_PX} × {SCREEN_HEIGHT_PX}")
 
-    # LSL setup – 16 channels (data values only – no timestamp in sample)
-    outlet_info = pylsl.StreamInfo(LSL_STREAM_NAME, LSL_STREAM_TYPE, 16, LSL_NOMINAL_SRATE, 'float32', LSL_SOURCE_ID)
-    outlet_info.desc().append_child_value("manufacturer", "Eyeware Beam")
-    channels = outlet_info.desc().append_child("channels")
-
-    ch_names = [
-        "gaze_conf_int",
-        "gaze_por_x",
-        "gaze_por_y",
-        "head_conf_int",
-        "head_pos_x_m",
-        "head_pos_y_m",
-        "head_pos_z_m",
-        "rot_m11", "rot_m12", "rot_m13",
-        "rot_m21", "rot_m22", "rot_m23",
-        "rot_m31", "rot_m32", "rot_m33"
-    ]
-
-    for name in ch_names:
-        ch = channels.append_child("channel")
-        ch.append_child_value("label", name)
-
-    outlet = pylsl.StreamOutlet(outlet_info)
-    print(f"LSL stream: '{LSL_STREAM_NAME}' ({LSL_STREAM_TYPE}) – 16 channels")
+    # LSL setup – gaze, head position and rotation in the selected layout (data values only – no timestamp in sample)
+    stream_name = LSL_STREAM_NAMES[layout]
+    n_channels = len(channel_names(layout))
+    outlet = make_outlet(stream_name, LSL_STREAM_TYPE, LSL_NOMINAL_SRATE, LSL_SOURCE_ID, layout)
+    publisher = GazeHeadPublisher(outlet, LSL_PUSH_MODE, LSL_CHUNK_MS, layout)
+    print(f"LSL stream: '{stream_name}' ({LSL_STREAM_TYPE}) – {n_channels} channels ({layout}), push mode '{LSL_PUSH_MODE}'")
+
+    # Tracker timestamps are mapped onto the LSL clock; the model is published for diagnostics
+    clock = ClockMapper(CLOCK_BLOCK_S, CLOCK_HISTORY_BLOCKS)
+    clock_outlet = make_clock_outlet(LSL_CLOCK_STREAM_NAME, f"{LSL_SOURCE_ID}_clock")
+    print(f"LSL clock diagnostics: '{LSL_CLOCK_STREAM_NAME}'")
+
+    # Online fixation/saccade classification on the same samples
+    if USE_UNIFIED_VIEWPORT:
+        detector = FixationDetector(FIXATION_METHOD, SCREEN_WIDTH_M, SCREEN_HEIGHT_M)
+    else:
+        detector = FixationDetector(FIXATION_METHOD, SCREEN_WIDTH_M / SCREEN_WIDTH_PX,
+                                    SCREEN_HEIGHT_M / SCREEN_HEIGHT_PX)
+    event_outlet = make_event_outlet(LSL_EVENT_STREAM_NAME, f"{LSL_SOURCE_ID}_events")
+    print(f"LSL gaze events: '{LSL_EVENT_STREAM_NAME}' ({FIXATION_METHOD.upper()})")
+
+    null_ts = NULL_DATA_TIMESTAMP().value
 
     class TrackingLogger(TrackingListener):
         def on_tracking_state_set_update(self, tracking_state_set, timestamp):
-            ts_val = timestamp.value
-
+            arrival = pylsl.local_clock()
             user = tracking_state_set.user_state()
-            if user.timestamp_in_seconds.value == NULL_DATA_TIMESTAMP().value:
+            sdk_t = user.timestamp_in_seconds.value
+            if sdk_t == null_ts:
                 print(f"[{datetime.now().isoformat(timespec='milliseconds')}] NULL timestamp – skipping")
                 return
 
+            clock.add(sdk_t, arrival)
+            if clock.updated:
+                clock.updated = False
+                clock_outlet.push_sample(clock_diagnostics(clock, sdk_t))
+            lsl_t = clock.map_one(sdk_t, arrival)  # Tracker time on the LSL clock
+            publisher.publish(user, lsl_t)
+
             gaze = user.unified_screen_gaze
             head = user.head_pose
-
-            now_iso = datetime.now().isoformat(timespec='milliseconds')
-
-            # Gaze
-            gaze_conf_int = gaze.confidence
-            if gaze_conf_int == 0:
-                por_x = por_y = float('nan')
+            distance = abs(head.translation_from_hcs_to_wcs.z) if head.confidence != 0 else None
+            if gaze.confidence != 0:
+                por = gaze.point_of_regard
+                events = detector.update(lsl_t, por.x, por.y, True, distance)
             else:
-                por_x = gaze.point_of_regard.x
-                por_y = gaze.point_of_regard.y
+                events = detector.update(lsl_t, 0.0, 0.0, False)
+            if events:
+                push_events(event_outlet, events)
 
-            # Head position & rotation matrix
-            head_conf_int = head.confidence
-
-            if head_conf_int == 0:
-                head_pos_x = head_pos_y = head_pos_z = float('nan')
-                rot_flat = [float('nan')] * 9
-            else:
-                pos = head.translation_from_hcs_to_wcs
-                head_pos_x, head_pos_y, head_pos_z = pos.x, pos.y, pos.z
-
-                rot_mat = head.rotation_from_hcs_to_wcs  # 3×3 numpy array
-                rot_flat = rot_mat.flatten().tolist()    # 9 elements
-
-            # LSL sample – 16 floats
-            sample = [
-                float(gaze_conf_int),
-                por_x if gaze_conf_int != 0 else 0.0,
-                por_y if gaze_conf_int != 0 else 0.0,
-                float(head_conf_int),
-                head_pos_x if head_conf_int != 0 else 0.0,
-                head_pos_y if head_conf_int != 0 else 0.0,
-                head_pos_z if head_conf_int != 0 else 0.0,
-            ] + rot_flat
-            outlet.push_sample(sample)  # LSL auto-timestamps
-
-            # Live print
-            '''print(f"[{now_iso}] ts={ts_val:.2f}s | "
-                f"Gaze conf {gaze_conf_int} POR ({por_x:.4f}, {por_y:.4f}) | "
-                f"Head conf {head_conf_int} Pos ({head_pos_x:.3f}, {head_pos_y:.3f}, {head_pos_z:.3f}m) "
-                f"Matrix sample: {rot_flat[:3]} ...")
-            '''
         def on_tracking_data_reception_status_changed(self, status):
             print(f"Tracking reception status: {status}")
 
@@ -126,16 +122,30 @@ def start_beam_stream():
     handle = api.start_receiving_tracking_data_on_listener(listener)
 
     print("\nActive. Press Ctrl+C to stop.")
-    print(f"LSL: '{LSL_STREAM_NAME}' – 16 channels (data values only)")
+    print(f"LSL: '{stream_name}' – {n_channels} channels (data values only)")
 
+    # In chunk mode the wait doubles as the flush timer for a stalled tracker
+    poll_s = LSL_CHUNK_MS / 2000.0 if LSL_PUSH_MODE == PUSH_CHUNK else 0.5
     try:
         while True:
-            time.sleep(0.5)
+            time.sleep(poll_s)
+            publisher.flush_stale()
     except KeyboardInterrupt:
         print("\nShutting down...")
     finally:
         api.stop_receiving_tracking_data_on_listener(handle)
+        publisher.flush()
         print("Done.")
 
 if __name__ == "__main__":
-    start_beam_stream()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Stream Beam eye tracker gaze and head pose to LSL")
+    parser.add_argument("--backend", choices=BACKENDS, default=BEAM_BACKEND, help="Tracker backend")
+    parser.add_argument("--layout", choices=LAYOUTS, default=LSL_ROTATION_LAYOUT,
+                        help="Head rotation channels: matrix16 (original), quaternion or euler")
+    parser.add_argument("--mock-rate", type=int, choices=MOCK_RATES, default=60,
+                        help="Tracking rate of the mock backend (Hz)")
+    parser.add_argument("--mock-recording", default=None,
+                        help="XDF with a recorded GazeHead stream to replay (mock backend)")
+    args = parser.parse_args()
+
+    start_beam_stream(load_backend(args.backend, args.mock_rate, args.mock_recording), args.layout)
\ No newline at end of file
@@ -0,0 +1,37 @@
+import functools
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# ── BACKENDS ────────────────────────────────────────────
+SDK = "sdk"     # Eyeware Beam SDK (Windows, bundled win_amd64 builds)
+MOCK = "mock"   # beam_mock.py: synthetic or recorded tracking states, any OS
+BACKENDS = (SDK, MOCK)
+
+SDK_PATH = Path(__file__).parent / "beam_eye_tracker_sdk" / "beam_eye_tracker_sdk-2.1.0" / "python" / "package"
+# ────────────────────────────────────────────────────────
+
+
+def load_backend(name, mock_rate=60, mock_recording=None):
+    """
+    Tracker backend: a namespace with API, ViewportGeometry, Point,
+    TrackingListener and NULL_DATA_TIMESTAMP, used exactly like the SDK module.
+    The SDK is only imported when it is selected.
+    """
+    if name == SDK:
+        sys.path.append(str(SDK_PATH))
+        from eyeware import beam_eye_tracker as module
+        api = module.API
+    elif name == MOCK:
+        import beam_mock as module
+        api = functools.partial(module.API, rate=mock_rate, recording=mock_recording)
+    else:
+        raise ValueError(f"Unknown backend '{name}', expected one of {BACKENDS}")
+    return SimpleNamespace(
+        name=name,
+        API=api,
+        ViewportGeometry=module.ViewportGeometry,
+        Point=module.Point,
+        TrackingListener=module.TrackingListener,
+        NULL_DATA_TIMESTAMP=module.NULL_DATA_TIMESTAMP,
+    )
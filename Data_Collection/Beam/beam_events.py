@@ -0,0 +1,168 @@
+import json
+import math
+
+import pylsl
+
+# ── FIXATION / SACCADE DETECTION ────────────────────────
+IVT = "ivt"                    # Velocity threshold (Salvucci & Goldberg 2000)
+IDT = "idt"                    # Dispersion threshold
+VELOCITY_THRESHOLD_DEG_S = 30.0
+DISPERSION_THRESHOLD_DEG = 1.0
+MIN_FIXATION_MS = 80.0         # Shorter fixations are not reported
+MAX_GAP_MS = 100.0             # Longer tracking loss ends the current event
+DEFAULT_DISTANCE_M = 0.6       # Viewing distance when head pose is not tracked
+# ────────────────────────────────────────────────────────
+
+
+def make_event_outlet(name, source_id):
+    """Irregular string marker stream; each marker is one JSON event."""
+    info = pylsl.StreamInfo(name, "Markers", 1, 0.0, 'string', source_id)
+    info.desc().append_child_value("format", "json")
+    info.desc().append_child_value("events", "fixation_start,fixation_end,saccade")
+    return pylsl.StreamOutlet(info)
+
+
+class FixationDetector:
+    """
+    Incremental I-VT / I-DT classifier with O(1) state per sample.
+
+    update() takes one gaze sample (LSL time, point of regard in stream
+    units, validity, head distance) and returns the events it completes.
+    Points are converted to degrees of visual angle using the screen's
+    pixel pitch and the current viewing distance; centroids are reported in
+    the stream's own units (normalized or pixels) so they match gaze_por_x/y.
+
+    I-DT here is the streaming variant: a fixation grows while the running
+    bounding box stays within the dispersion threshold and restarts at the
+    sample that breaks it, instead of re-scanning a sliding window.
+    """
+
+    def __init__(self, method, units_to_m_x, units_to_m_y):
+        if method not in (IVT, IDT):
+            raise ValueError(f"Unknown method '{method}'")
+        self.method = method
+        self.units_to_m_x = units_to_m_x   # Stream units -> meters on screen
+        self.units_to_m_y = units_to_m_y
+        self._reset()
+
+    def _reset(self):
+        self.last_t = None
+        self.last_x = self.last_y = 0.0     # Degrees
+        self.in_fixation = False
+        self.started = False                # fixation_start already emitted
+        self.fix_t0 = 0.0
+        self.fix_x0 = self.fix_y0 = 0.0     # Degrees
+        self.fix_n = 0
+        self.sum_u = self.sum_v = 0.0       # Stream units, for the centroid
+        self.min_x = self.max_x = self.min_y = self.max_y = 0.0
+        self.sac_t0 = None
+        self.sac_x0 = self.sac_y0 = 0.0
+        self.sac_peak = 0.0
+
+    def update(self, t, u, v, valid, distance_m=None):
+        events = []
+        if not valid:
+            if self.last_t is not None and (t - self.last_t) * 1000.0 > MAX_GAP_MS:
+                events += self._end_fixation(self.last_t)
+                self._reset()
+            return events
+
+        # Stream units -> degrees of visual angle (small-angle approximation)
+        deg_per_m = math.degrees(1.0 / (distance_m or DEFAULT_DISTANCE_M))
+        x = u * self.units_to_m_x * deg_per_m
+        y = v * self.units_to_m_y * deg_per_m
+
+        if self.last_t is None:
+            self._start_fixation(t, u, v, x, y)
+        elif self.method == IVT:
+            dt = t - self.last_t
+            velocity = math.hypot(x - self.last_x, y - self.last_y) / dt if dt > 0 else 0.0
+            if velocity < VELOCITY_THRESHOLD_DEG_S:
+                if self.in_fixation:
+                    self._add_to_fixation(u, v, x, y)
+                else:
+                    self._start_fixation(t, u, v, x, y)
+            else:
+                events += self._break_fixation()
+                self.sac_peak = max(self.sac_peak, velocity)
+        else:
+            min_x, max_x = min(self.min_x, x), max(self.max_x, x)
+            min_y, max_y = min(self.min_y, y), max(self.max_y, y)
+            if (max_x - min_x) + (max_y - min_y) <= DISPERSION_THRESHOLD_DEG:
+                self._add_to_fixation(u, v, x, y)
+            else:
+                events += self._break_fixation()
+                self._start_fixation(t, u, v, x, y)
+
+        if self.in_fixation and not self.started and (t - self.fix_t0) * 1000.0 >= MIN_FIXATION_MS:
+            # The saccade (and any too-short fixations inside it) ends where this fixation began
+            events += self._end_saccade(self.fix_t0, self.fix_x0, self.fix_y0)
+            self.started = True
+            events.append({"event": "fixation_start", "t": self.fix_t0,
+                           "x": self.sum_u / self.fix_n, "y": self.sum_v / self.fix_n})
+
+        self.last_t, self.last_x, self.last_y = t, x, y
+        return events
+
+    def _start_fixation(self, t, u, v, x, y):
+        self.in_fixation = True
+        self.started = False
+        self.fix_t0 = t
+        self.fix_x0, self.fix_y0 = x, y
+        self.fix_n = 1
+        self.sum_u, self.sum_v = u, v
+        self.min_x = self.max_x = x
+        self.min_y = self.max_y = y
+
+    def _add_to_fixation(self, u, v, x, y):
+        self.fix_n += 1
+        self.sum_u += u
+        self.sum_v += v
+        self.min_x, self.max_x = min(self.min_x, x), max(self.max_x, x)
+        self.min_y, self.max_y = min(self.min_y, y), max(self.max_y, y)
+
+    def _break_fixation(self):
+        """Current sample leaves the fixation: report it and open a saccade if none is open."""
+        if not self.in_fixation:
+            return []
+        was_reported = self.started
+        events = self._end_fixation(self.last_t)
+        if was_reported and self.sac_t0 is None:
+            self._start_saccade(self.last_t)
+        return events
+
+    def _end_fixation(self, t_end):
+        if not self.in_fixation:
+            return []
+        self.in_fixation = False
+        if not self.started:
+            return []  # Too short to report
+        return [{"event": "fixation_end", "t": t_end, "start": self.fix_t0,
+                 "duration_ms": (t_end - self.fix_t0) * 1000.0,
+                 "x": self.sum_u / self.fix_n, "y": self.sum_v / self.fix_n}]
+
+    def _start_saccade(self, t0):
+        self.sac_t0 = t0
+        self.sac_x0, self.sac_y0 = self.last_x, self.last_y
+        self.sac_peak = 0.0
+
+    def _end_saccade(self, t_end, x, y):
+        if self.sac_t0 is None:
+            return []
+        event = {"event": "saccade", "t": t_end, "start": self.sac_t0,
+                 "duration_ms": (t_end - self.sac_t0) * 1000.0,
+                 "amplitude_deg": math.hypot(x - self.sac_x0, y - self.sac_y0)}
+        if self.method == IVT:
+            event["peak_velocity_deg_s"] = self.sac_peak
+        self.sac_t0 = None
+        return [event]
+
+
+def push_events(outlet, events):
+    """
+    Each event is stamped with its own time "t" on the LSL clock (onset for
+    fixation_start, end for fixation_end and saccade); "start" stays in the
+    JSON payload, so marker timestamps never run backwards.
+    """
+    for event in events:
+        outlet.push_sample([json.dumps(event, separators=(",", ":"))], event["t"])
\ No newline at end of file
@@ -0,0 +1,241 @@
+import math
+import threading
+
+import numpy as np
+import pylsl
+
+# ── LSL LAYOUT ──────────────────────────────────────────
+BASE_CH_NAMES = [
+    "gaze_conf_int",
+    "gaze_por_x",
+    "gaze_por_y",
+    "head_conf_int",
+    "head_pos_x_m",
+    "head_pos_y_m",
+    "head_pos_z_m",
+]
+N_BASE = len(BASE_CH_NAMES)
+
+LAYOUT_MATRIX = "matrix16"        # Full rotation_from_hcs_to_wcs, row major (original layout)
+LAYOUT_QUATERNION = "quaternion"  # Unit quaternion, w >= 0
+LAYOUT_EULER = "euler"            # Yaw/pitch/roll in radians, R = Rz(roll) @ Ry(yaw) @ Rx(pitch)
+ROTATION_CH_NAMES = {
+    LAYOUT_MATRIX: ["rot_m11", "rot_m12", "rot_m13",
+                    "rot_m21", "rot_m22", "rot_m23",
+                    "rot_m31", "rot_m32", "rot_m33"],
+    LAYOUT_QUATERNION: ["head_quat_w", "head_quat_x", "head_quat_y", "head_quat_z"],
+    LAYOUT_EULER: ["head_yaw_rad", "head_pitch_rad", "head_roll_rad"],
+}
+LAYOUTS = tuple(ROTATION_CH_NAMES)
+
+CH_NAMES = BASE_CH_NAMES + ROTATION_CH_NAMES[LAYOUT_MATRIX]
+N_CHANNELS = len(CH_NAMES)
+
+PUSH_SAMPLE = "sample"   # One push per callback (lowest latency)
+PUSH_CHUNK = "chunk"     # Collect samples for up to chunk_ms, then one push (lowest overhead)
+CHUNK_CAPACITY = 256     # Rows in the chunk buffer; a full buffer is flushed early
+# ────────────────────────────────────────────────────────
+
+
+def channel_names(layout):
+    if layout not in ROTATION_CH_NAMES:
+        raise ValueError(f"Unknown channel layout '{layout}'")
+    return BASE_CH_NAMES + ROTATION_CH_NAMES[layout]
+
+
+def make_outlet(name, stream_type, srate, source_id, layout=LAYOUT_MATRIX):
+    """Float32 gaze/head outlet (data values only – no timestamp in sample) in the given layout."""
+    ch_names = channel_names(layout)
+    outlet_info = pylsl.StreamInfo(name, stream_type, len(ch_names), srate, 'float32', source_id)
+    outlet_info.desc().append_child_value("manufacturer", "Eyeware Beam")
+    outlet_info.desc().append_child_value("rotation_layout", layout)
+    channels = outlet_info.desc().append_child("channels")
+    for ch_name in ch_names:
+        ch = channels.append_child("channel")
+        ch.append_child_value("label", ch_name)
+        if ch_name.endswith("_rad"):
+            ch.append_child_value("unit", "radians")
+        elif ch_name.endswith("_m"):
+            ch.append_child_value("unit", "meters")
+    return pylsl.StreamOutlet(outlet_info)
+
+
+def quaternions_from_matrices(r, out):
+    """(n, 3, 3) rotation matrices -> (n, 4) unit quaternions (w, x, y, z), w >= 0."""
+    m00, m11, m22 = r[:, 0, 0], r[:, 1, 1], r[:, 2, 2]
+    out[:, 0] = 0.5 * np.sqrt(np.maximum(0.0, 1.0 + m00 + m11 + m22))
+    out[:, 1] = 0.5 * np.copysign(np.sqrt(np.maximum(0.0, 1.0 + m00 - m11 - m22)), r[:, 2, 1] - r[:, 1, 2])
+    out[:, 2] = 0.5 * np.copysign(np.sqrt(np.maximum(0.0, 1.0 - m00 + m11 - m22)), r[:, 0, 2] - r[:, 2, 0])
+    out[:, 3] = 0.5 * np.copysign(np.sqrt(np.maximum(0.0, 1.0 - m00 - m11 + m22)), r[:, 1, 0] - r[:, 0, 1])
+
+
+def euler_from_matrices(r, out):
+    """(n, 3, 3) rotation matrices -> (n, 3) yaw (about y), pitch (about x), roll (about z)."""
+    out[:, 0] = np.arctan2(-r[:, 2, 0], np.hypot(r[:, 2, 1], r[:, 2, 2]))
+    out[:, 1] = np.arctan2(r[:, 2, 1], r[:, 2, 2])
+    out[:, 2] = np.arctan2(r[:, 1, 0], r[:, 0, 0])
+
+
+def quaternion_from_matrix(r, out):
+    """Single-sample quaternions_from_matrices on Python floats (numpy overhead dominates for n=1)."""
+    (m00, m01, m02), (m10, m11, m12), (m20, m21, m22) = r.tolist()
+    out[0] = 0.5 * math.sqrt(max(0.0, 1.0 + m00 + m11 + m22))
+    out[1] = 0.5 * math.copysign(math.sqrt(max(0.0, 1.0 + m00 - m11 - m22)), m21 - m12)
+    out[2] = 0.5 * math.copysign(math.sqrt(max(0.0, 1.0 - m00 + m11 - m22)), m02 - m20)
+    out[3] = 0.5 * math.copysign(math.sqrt(max(0.0, 1.0 - m00 - m11 + m22)), m10 - m01)
+
+
+def euler_from_matrix(r, out):
+    """Single-sample euler_from_matrices on Python floats."""
+    (m00, _, _), (m10, _, _), (m20, m21, m22) = r.tolist()
+    out[0] = math.atan2(-m20, math.hypot(m21, m22))
+    out[1] = math.atan2(m21, m22)
+    out[2] = math.atan2(m10, m00)
+
+
+ROTATION_ENCODERS = {  # layout -> (per-sample, per-chunk)
+    LAYOUT_QUATERNION: (quaternion_from_matrix, quaternions_from_matrices),
+    LAYOUT_EULER: (euler_from_matrix, euler_from_matrices),
+}
+
+
+class GazeHeadPublisher:
+    """
+    Hot path of the tracking callback: writes one user state into a
+    preallocated float32 row and pushes it, without building Python lists.
+
+    In chunk mode rows accumulate in a (CHUNK_CAPACITY, channels) buffer and
+    are pushed together once the oldest one is chunk_ms old, each with its
+    own timestamp. For the quaternion and Euler layouts the rotation matrices
+    are staged next to the rows and converted for the whole chunk at once
+    just before the push (per-sample mode converts each one with scalar
+    math); rows without head tracking get NaN rotations.
+
+    Chunk age is otherwise only checked when the next sample arrives, so
+    the owner calls flush_stale() on a timer: a stalled tracker still gets
+    its buffered rows out within about chunk_ms. The lock serialises the
+    callback and the timer in chunk mode.
+    """
+
+    def __init__(self, outlet, push_mode=PUSH_SAMPLE, chunk_ms=50.0, layout=LAYOUT_MATRIX):
+        if push_mode not in (PUSH_SAMPLE, PUSH_CHUNK):
+            raise ValueError(f"Unknown push mode '{push_mode}'")
+        self.outlet = outlet
+        self.push_mode = push_mode
+        self.chunk_s = chunk_ms / 1000.0
+        self.layout = layout
+        n_channels = len(channel_names(layout))
+
+        self.chunk = np.zeros((CHUNK_CAPACITY, n_channels), dtype=np.float32)
+        self.chunk_ts = np.zeros(CHUNK_CAPACITY, dtype=np.float64)
+        self.chunk_len = 0
+        self.lock = threading.Lock()
+        # Preallocated views per row, so writing a sample never slices
+        self.rows = [self.chunk[i] for i in range(CHUNK_CAPACITY)]
+        if layout == LAYOUT_MATRIX:
+            self.rot_views = [self.chunk[i, N_BASE:].reshape(3, 3) for i in range(CHUNK_CAPACITY)]
+        else:
+            self.encode_one, self.encode = ROTATION_ENCODERS[layout]
+            self.rot = np.zeros((CHUNK_CAPACITY, 3, 3), dtype=np.float64)
+            self.rot_views = [self.rot[i] for i in range(CHUNK_CAPACITY)]
+            self.rot_lost = np.zeros(CHUNK_CAPACITY, dtype=bool)
+            self.rot_out = np.zeros((CHUNK_CAPACITY, n_channels - N_BASE), dtype=np.float64)
+
+    def publish(self, user, timestamp=0.0):
+        """Write one UserState. timestamp=0.0 lets LSL stamp it at push time."""
+        if self.push_mode == PUSH_SAMPLE:
+            self._write(user, 0)
+            # A 1-row float32 array goes to liblsl in one call (push_sample would copy it element-wise)
+            self.outlet.push_chunk(self.rows[0], timestamp)
+            return
+
+        with self.lock:
+            i = self.chunk_len
+            self._write(user, i)
+            self.chunk_ts[i] = timestamp or pylsl.local_clock()
+            self.chunk_len += 1
+            if self.chunk_len == CHUNK_CAPACITY or self.chunk_ts[i] - self.chunk_ts[0] >= self.chunk_s:
+                self._flush()
+
+    def _write(self, user, i):
+        row = self.rows[i]
+
+        # Gaze
+        gaze = user.unified_screen_gaze
+        gaze_conf_int = gaze.confidence
+        row[0] = gaze_conf_int
+        if gaze_conf_int == 0:
+            row[1] = row[2] = 0.0
+        else:
+            por = gaze.point_of_regard
+            row[1] = por.x
+            row[2] = por.y
+
+        # Head position & rotation
+        head = user.head_pose
+        head_conf_int = head.confidence
+        row[3] = head_conf_int
+        staged = self.layout != LAYOUT_MATRIX and self.push_mode == PUSH_CHUNK
+        if head_conf_int == 0:
+            row[4] = row[5] = row[6] = 0.0
+            if staged:
+                self.rot_lost[i] = True
+            else:
+                row[N_BASE:] = np.nan
+        else:
+            pos = head.translation_from_hcs_to_wcs
+            row[4] = pos.x
+            row[5] = pos.y
+            row[6] = pos.z
+            if self.layout == LAYOUT_MATRIX:
+                self.rot_views[i][...] = head.rotation_from_hcs_to_wcs  # 3×3, row major as before
+            elif staged:
+                self.rot_views[i][...] = head.rotation_from_hcs_to_wcs
+                self.rot_lost[i] = False
+            else:
+                self.encode_one(head.rotation_from_hcs_to_wcs, self.rot_out[0])
+                row[N_BASE:] = self.rot_out[0]
+
+    def flush_stale(self, now=None):
+        """Push the buffered rows if the oldest is chunk_ms old (LSL clock); for a timer."""
+        if self.push_mode != PUSH_CHUNK:
+            return
+        with self.lock:
+            if self.chunk_len and (now or pylsl.local_clock()) - self.chunk_ts[0] >= self.chunk_s:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        n = self.chunk_len
+        if n:
+            if self.layout != LAYOUT_MATRIX:
+                # Staged matrices -> rotation channels for the whole chunk
+                out = self.rot_out[:n]
+                self.encode(self.rot[:n], out)
+                out[self.rot_lost[:n]] = np.nan
+                self.chunk[:n, N_BASE:] = out
+            self.outlet.push_chunk(self.chunk[:n], self.chunk_ts[:n].tolist())
+            self.chunk_len = 0
+
+# ── SDK CLOCK → LSL CLOCK (model in Data_Collection/clock_sync.py) ──
+CLOCK_BLOCK_S = 2.0       # One minimum-delay point (and one diagnostics sample) per block
+CLOCK_HISTORY_BLOCKS = 150  # Blocks in the offset/drift fit (5 min)
+CLOCK_CH_NAMES = ["offset_s", "drift_ppm", "residual_mean_ms", "residual_std_ms", "residual_max_ms", "samples"]
+
+
+def make_clock_outlet(name, source_id):
+    """Irregular diagnostics stream with the SDK→LSL clock model and its residuals."""
+    info = pylsl.StreamInfo(name, "Diagnostics", len(CLOCK_CH_NAMES), 0.0, 'double64', source_id)
+    channels = info.desc().append_child("channels")
+    for ch_name in CLOCK_CH_NAMES:
+        channels.append_child("channel").append_child_value("label", ch_name)
+    return pylsl.StreamOutlet(info)
+
+
+def clock_diagnostics(clock, sdk_t):
+    """One CLOCK_CH_NAMES sample from a clock_sync.ClockMapper whose block just closed."""
+    return [float(clock.map(sdk_t)) - sdk_t, clock.drift * 1e6, clock.mean_delay * 1000.0,
+            clock.delay_std * 1000.0, clock.max_delay * 1000.0, float(clock.delay_count)]
@@ -0,0 +1,289 @@
+"""
+Stand-in for eyeware.beam_eye_tracker that runs without the Windows SDK.
+
+Mirrors the parts of the SDK that beam.py uses (API, TrackingListener,
+ViewportGeometry, Point, NULL_DATA_TIMESTAMP and the UserState attributes)
+and drives the listener from a thread at a fixed rate with either synthetic
+tracking states or the rows of a recorded BeamEyeTracker_GazeHead
+stream. Tracker timestamps come from their own clock, offset from
+pylsl.local_clock(), as they do with the real tracker.
+"""
+import threading
+import time
+from enum import IntEnum
+
+import numpy as np
+
+# ── MOCK CONFIG ─────────────────────────────────────────
+MOCK_RATES = (30, 60, 120)      # Update rates the Beam tracker runs at (Hz)
+SDK_CLOCK_OFFSET_S = 1000.0     # Tracker clock = time.monotonic() + offset
+FIXATION_MS = (150, 450)        # Synthetic fixation duration range
+SACCADE_MS = (30, 60)           # Synthetic saccade duration range
+GAZE_NOISE = 0.001              # Fixation jitter (fraction of the viewport)
+LOST_PROB = 0.005               # Per-sample chance a tracking loss starts
+LOST_MS = (100, 400)            # Tracking loss duration range
+# ────────────────────────────────────────────────────────
+
+
+class TrackingConfidence(IntEnum):
+    LOST_TRACKING = 0
+    LOW = 1
+    MEDIUM = 2
+    HIGH = 3
+
+
+class TrackingDataReceptionStatus(IntEnum):
+    NOT_RECEIVING_TRACKING_DATA = 0
+    RECEIVING_TRACKING_DATA = 1
+    ATTEMPTING_TRACKING_AUTO_START = 2
+
+
+class Timestamp:
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+
+def NULL_DATA_TIMESTAMP():
+    return Timestamp(-1.0)
+
+
+class Point:
+    __slots__ = ("x", "y")
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class Vector3D:
+    __slots__ = ("x", "y", "z")
+
+    def __init__(self, x, y, z):
+        self.x = x
+        self.y = y
+        self.z = z
+
+
+class ViewportGeometry:
+    def __init__(self, point_00, point_11):
+        self.point_00 = point_00
+        self.point_11 = point_11
+
+
+class UnifiedScreenGaze:
+    __slots__ = ("confidence", "point_of_regard", "unbounded_point_of_regard")
+
+    def __init__(self, confidence, point_of_regard):
+        self.confidence = confidence
+        self.point_of_regard = point_of_regard
+        self.unbounded_point_of_regard = point_of_regard
+
+
+class HeadPose:
+    __slots__ = ("confidence", "rotation_from_hcs_to_wcs", "translation_from_hcs_to_wcs", "track_session_uid")
+
+    def __init__(self, confidence, rotation, translation):
+        self.confidence = confidence
+        self.rotation_from_hcs_to_wcs = rotation
+        self.translation_from_hcs_to_wcs = translation
+        self.track_session_uid = 1
+
+
+class UserState:
+    __slots__ = ("timestamp_in_seconds", "head_pose", "unified_screen_gaze")
+
+    def __init__(self, timestamp, gaze, head):
+        self.timestamp_in_seconds = timestamp
+        self.unified_screen_gaze = gaze
+        self.head_pose = head
+
+
+class TrackingStateSet:
+    __slots__ = ("_user",)
+
+    def __init__(self, user):
+        self._user = user
+
+    def user_state(self):
+        return self._user
+
+
+class TrackingListener:
+    def on_tracking_data_reception_status_changed(self, status):
+        pass
+
+    def on_tracking_state_set_update(self, tracking_state_set, timestamp):
+        pass
+
+
+def rotation_matrix(yaw, pitch, roll):
+    """Rotation (radians) as R = Rz(roll) @ Ry(yaw) @ Rx(pitch), float64 3×3 like the SDK."""
+    cy, sy = np.cos(yaw), np.sin(yaw)
+    cp, sp = np.cos(pitch), np.sin(pitch)
+    cr, sr = np.cos(roll), np.sin(roll)
+    rx = np.array([[1, 0, 0], [0, cp, -sp], [0, sp, cp]])
+    ry = np.array([[cy, 0, sy], [0, 1, 0], [-sy, 0, cy]])
+    rz = np.array([[cr, -sr, 0], [sr, cr, 0], [0, 0, 1]])
+    return rz @ ry @ rx
+
+
+class SyntheticSource:
+    """
+    Endless fixation/saccade gaze with head sway and occasional tracking loss.
+
+    Gaze is in viewport coordinates (point_00 → point_11), so it matches
+    whichever viewport the API was created with.
+    """
+
+    def __init__(self, rate, viewport, seed=0):
+        self.dt = 1.0 / rate
+        self.rng = np.random.default_rng(seed)
+        x0, y0 = viewport.point_00.x, viewport.point_00.y
+        self.origin = np.array([x0, y0], dtype=float)
+        self.extent = np.array([viewport.point_11.x - x0, viewport.point_11.y - y0], dtype=float)
+        self.t = 0.0
+        self.pos = self.rng.random(2)
+        self.target = self.pos
+        self.phase_end = 0.0
+        self.saccade_from = None
+        self.saccade_start = 0.0
+        self.lost_until = -1.0
+
+    def _next_phase(self):
+        rng = self.rng
+        if self.saccade_from is None:
+            # Start a saccade to a new target
+            self.saccade_from = self.pos
+            self.target = rng.uniform(0.05, 0.95, 2)
+            self.saccade_start = self.t
+            self.phase_end = self.t + rng.uniform(*SACCADE_MS) / 1000.0
+        else:
+            self.pos = self.target
+            self.saccade_from = None
+            self.phase_end = self.t + rng.uniform(*FIXATION_MS) / 1000.0
+
+    def next_user(self, sdk_t):
+        rng = self.rng
+        self.t += self.dt
+        if self.t >= self.phase_end:
+            self._next_phase()
+        if self.saccade_from is not None:
+            f = (self.t - self.saccade_start) / max(self.phase_end - self.saccade_start, 1e-9)
+            por = self.saccade_from + (self.target - self.saccade_from) * min(f, 1.0)
+        else:
+            por = self.pos + rng.normal(0.0, GAZE_NOISE, 2)
+        if self.t >= self.lost_until and rng.random() < LOST_PROB:
+            self.lost_until = self.t + rng.uniform(*LOST_MS) / 1000.0
+        lost = self.t < self.lost_until
+
+        xy = self.origin + por * self.extent
+        gaze = UnifiedScreenGaze(TrackingConfidence.LOST_TRACKING if lost else TrackingConfidence.HIGH,
+                                 Point(float(xy[0]), float(xy[1])))
+        sway = np.sin(self.t * np.array([0.3, 0.5, 0.2]) * 2 * np.pi)
+        head = HeadPose(TrackingConfidence.LOST_TRACKING if lost else TrackingConfidence.MEDIUM,
+                        rotation_matrix(*(0.05 * sway)),
+                        Vector3D(0.01 * sway[0], -0.02 + 0.01 * sway[1], 0.6 + 0.02 * sway[2]))
+        return UserState(Timestamp(sdk_t), gaze, head)
+
+
+def quaternion_matrix(w, x, y, z):
+    return np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)],
+        [2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)],
+        [2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)],
+    ])
+
+
+class RecordedSource:
+    """
+    Replays a recorded Beam GazeHead stream (XDF), looping at the mock rate.
+
+    Any of the collector's channel layouts (matrix16, quaternion, euler) can
+    be replayed; rotations are rebuilt into matrices and rows are turned back
+    into tracking states with the same confidence gating the collector
+    applies, so replaying a recording reproduces its samples.
+    """
+
+    def __init__(self, path, stream_type="GazeHead"):
+        import pyxdf
+        streams, _ = pyxdf.load_xdf(str(path), select_streams=[{"type": stream_type}])
+        if not streams or len(streams[0]["time_series"]) == 0:
+            raise ValueError(f"No samples of a '{stream_type}' stream in {path}")
+        rows = np.asarray(streams[0]["time_series"], dtype=np.float64)
+        rot = rows[:, 7:]
+        if rot.shape[1] == 9:
+            rotations = rot.reshape(-1, 3, 3)
+        elif rot.shape[1] == 4:
+            rotations = [quaternion_matrix(*q) for q in rot]
+        elif rot.shape[1] == 3:
+            rotations = [rotation_matrix(*e) for e in rot]
+        else:
+            raise ValueError(f"Unknown Beam channel layout with {rows.shape[1]} channels")
+        self.rows = rows
+        self.rotations = [np.eye(3) if np.isnan(r).any() else r for r in rotations]
+        self.i = 0
+
+    def next_user(self, sdk_t):
+        i = self.i
+        row = self.rows[i]
+        self.i = (i + 1) % len(self.rows)
+        gaze = UnifiedScreenGaze(TrackingConfidence(int(row[0])), Point(row[1], row[2]))
+        head = HeadPose(TrackingConfidence(int(row[3])), self.rotations[i], Vector3D(row[4], row[5], row[6]))
+        return UserState(Timestamp(sdk_t), gaze, head)
+
+
+class API:
+    """Mock of eyeware.beam_eye_tracker.API; listeners are fed from one thread each."""
+
+    def __init__(self, friendly_name, initial_viewport_geometry, rate=60, recording=None, seed=0):
+        if rate not in MOCK_RATES:
+            raise ValueError(f"Mock rate must be one of {MOCK_RATES}, got {rate}")
+        self.friendly_name = friendly_name
+        self.viewport = initial_viewport_geometry
+        self.rate = rate
+        self.recording = recording
+        self.seed = seed
+        self.status = TrackingDataReceptionStatus.NOT_RECEIVING_TRACKING_DATA
+        self._threads = {}
+        self._next_handle = 1
+
+    def update_viewport_geometry(self, new_viewport_geometry):
+        self.viewport = new_viewport_geometry
+
+    def attempt_starting_the_beam_eye_tracker(self):
+        self.status = TrackingDataReceptionStatus.RECEIVING_TRACKING_DATA
+
+    def get_tracking_data_reception_status(self):
+        return self.status
+
+    def start_receiving_tracking_data_on_listener(self, listener):
+        if self.recording:
+            source = RecordedSource(self.recording)
+        else:
+            source = SyntheticSource(self.rate, self.viewport, self.seed)
+        stop = threading.Event()
+        thread = threading.Thread(target=self._run, args=(listener, source, stop), daemon=True)
+        handle = self._next_handle
+        self._next_handle += 1
+        self._threads[handle] = (thread, stop)
+        thread.start()
+        return handle
+
+    def stop_receiving_tracking_data_on_listener(self, listener_handle):
+        thread, stop = self._threads.pop(listener_handle)
+        stop.set()
+        thread.join()
+
+    def _run(self, listener, source, stop):
+        listener.on_tracking_data_reception_status_changed(self.status)
+        period = 1.0 / self.rate
+        next_t = time.monotonic()
+        while not stop.is_set():
+            next_t += period
+            delay = next_t - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            t = next_t + SDK_CLOCK_OFFSET_S  # Sample time on the tracker clock; sleep overshoot is delivery delay
+            listener.on_tracking_state_set_update(TrackingStateSet(source.next_user(t)), t)
@@ -0,0 +1,91 @@
+"""
+Microbenchmark of the Beam tracking callback hot path.
+
+Feeds synthetic tracking states from the mock backend (beam_mock.py) to
+GazeHeadPublisher in per-sample and chunk mode, and to the previous
+list-building callback for comparison, pushing into a real LSL outlet.
+Runs without the Beam SDK.
+
+    python bench_beam_callback.py --n 100000
+"""
+import argparse
+import time
+from datetime import datetime
+
+from beam_lsl import LAYOUT_MATRIX, LAYOUTS, PUSH_CHUNK, PUSH_SAMPLE, GazeHeadPublisher, make_outlet
+from beam_mock import Point, SyntheticSource, ViewportGeometry
+
+
+def synthetic_users(n, seed=0):
+    """Pool of tracking states from the mock backend (fixations, saccades, tracking loss)."""
+    source = SyntheticSource(60, ViewportGeometry(Point(0.0, 0.0), Point(1.0, 1.0)), seed)
+    return [source.next_user(i / 60) for i in range(n)]
+
+
+def legacy_callback(outlet):
+    """The list-building callback body as it was before GazeHeadPublisher."""
+    def publish(user):
+        gaze = user.unified_screen_gaze
+        head = user.head_pose
+        now_iso = datetime.now().isoformat(timespec='milliseconds')
+        gaze_conf_int = gaze.confidence
+        if gaze_conf_int == 0:
+            por_x = por_y = float('nan')
+        else:
+            por_x = gaze.point_of_regard.x
+            por_y = gaze.point_of_regard.y
+        head_conf_int = head.confidence
+        if head_conf_int == 0:
+            head_pos_x = head_pos_y = head_pos_z = float('nan')
+            rot_flat = [float('nan')] * 9
+        else:
+            pos = head.translation_from_hcs_to_wcs
+            head_pos_x, head_pos_y, head_pos_z = pos.x, pos.y, pos.z
+            rot_flat = head.rotation_from_hcs_to_wcs.flatten().tolist()
+        sample = [
+            float(gaze_conf_int),
+            por_x if gaze_conf_int != 0 else 0.0,
+            por_y if gaze_conf_int != 0 else 0.0,
+            float(head_conf_int),
+            head_pos_x if head_conf_int != 0 else 0.0,
+            head_pos_y if head_conf_int != 0 else 0.0,
+            head_pos_z if head_conf_int != 0 else 0.0,
+        ] + rot_flat
+        outlet.push_sample(sample)
+    return publish
+
+
+def time_per_call(publish, users, n):
+    pool = len(users)
+    for i in range(min(n, 1000)):  # Warm-up
+        publish(users[i % pool])
+    t0 = time.perf_counter()
+    for i in range(n):
+        publish(users[i % pool])
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time per Beam tracking callback")
+    parser.add_argument("--n", type=int, default=50000, help="Callbacks per variant")
+    parser.add_argument("--chunk-ms", type=float, default=50.0, help="Chunk age for the chunk variant")
+    parser.add_argument("--layout", choices=LAYOUTS, default=LAYOUT_MATRIX, help="Channel layout for the preallocated variants")
+    args = parser.parse_args()
+
+    users = synthetic_users(1024)
+    outlet = make_outlet("BeamBench", "GazeHead", 60.0, "beam_bench")
+    layout_outlet = make_outlet("BeamBenchLayout", "GazeHead", 60.0, "beam_bench_layout", args.layout)
+
+    chunked = GazeHeadPublisher(layout_outlet, PUSH_CHUNK, args.chunk_ms, args.layout)
+    results = {
+        "legacy list + push_sample": time_per_call(legacy_callback(outlet), users, args.n),
+        "preallocated, per-sample": time_per_call(GazeHeadPublisher(layout_outlet, PUSH_SAMPLE, layout=args.layout).publish,
+                                                  users, args.n),
+        f"preallocated, chunk {args.chunk_ms:g} ms": time_per_call(chunked.publish, users, args.n),
+    }
+    chunked.flush()
+
+    print(f"layout: {args.layout}")
+    print(f"{'variant':<32} us/callback")
+    for name, us in results.items():
+        print(f"{name:<32} {us:8.2f}")
\ No newline at end of file
@@ -1,64 +1,286 @@
+import argparse
+import selectors
 import socket
 import struct
-from pylsl import StreamInfo, StreamOutlet
+import sys
+from pathlib import Path
+from pylsl import StreamInfo, StreamOutlet, local_clock
 
-def start_band_receiver():
-    # Set up LSL streams
-    # GSR stream: 1 channel (resistance in kOhms)
-    gsr_info = StreamInfo('MSBand_GSR', 'GSR', 1, 0, 'float32', 'msband_gsr')
-    gsr_outlet = StreamOutlet(gsr_info)
+from band_protocol import (SENSOR_GSR, SENSOR_HR, decode_batch, gsr_chunk, hr_chunk, is_batch, parse_hello,
+                           parse_sender_time)
 
-    # HR stream: 2 channels (heart rate in bpm, quality flag: 1 for Locked, 0 otherwise)
-    hr_info = StreamInfo('MSBand_HR', 'HR', 2, 0, 'float32', 'msband_hr')
-    hr_outlet = StreamOutlet(hr_info)
+sys.path.append(str(Path(__file__).resolve().parent.parent))  # Shared modules in Data_Collection/
+from clock_sync import ClockMapper
 
-    # Set up TCP server
-    HOST = '127.0.0.1'  # Localhost
-    PORT = 5000         # Port from the provided code
+# Set up TCP server
+HOST = '127.0.0.1'  # Localhost
+PORT = 5000         # Port from the provided code
+
+HEADER = struct.Struct('!I')    # Length prefix (4 bytes, uint32, big endian as written by DataWriter)
+RECV_BUFFER_SIZE = 64 * 1024    # Initial frame buffer, grows up to MAX_FRAME_SIZE
+MAX_FRAME_SIZE = 1024 * 1024    # Anything larger is treated as a corrupt stream
+
+
+class FrameError(Exception):
+    """Raised when the length prefix cannot belong to a valid frame."""
+
+
+class FrameReader:
+    """
+    Reassembles length-prefixed frames from a TCP stream.
+
+    Data is received with recv_into() straight into one reusable bytearray;
+    complete frames are handed out as memoryview slices of that buffer, so a
+    frame split across several TCP segments (or several frames in one
+    segment) are both handled without per-read allocations.
+    """
+
+    def __init__(self, size=RECV_BUFFER_SIZE):
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.start = 0  # First unconsumed byte
+        self.end = 0    # One past the last received byte
+
+    def fill(self, sock):
+        """Receive whatever is available. Returns the number of bytes read (0 = peer closed)."""
+        if self.end == len(self.buffer):
+            self._make_room()
+        n = sock.recv_into(self.view[self.end:])
+        self.end += n
+        return n
+
+    def _make_room(self):
+        pending = self.end - self.start
+        if self.start > 0:
+            # Compact: move the partial frame to the front of the buffer
+            self.buffer[:pending] = self.buffer[self.start:self.end]
+        else:
+            # A single frame is larger than the buffer: swap in a bigger one
+            # (frames already handed out keep referencing the old buffer)
+            buffer = bytearray(2 * len(self.buffer))
+            buffer[:pending] = self.buffer[self.start:self.end]
+            self.buffer, self.view = buffer, memoryview(buffer)
+        self.start, self.end = 0, pending
+
+    def frames(self):
+        """Yield every complete frame payload currently buffered (only valid until the next fill)."""
+        while self.end - self.start >= HEADER.size:
+            (length,) = HEADER.unpack_from(self.buffer, self.start)
+            if length > MAX_FRAME_SIZE:
+                raise FrameError(f"Frame length {length} exceeds {MAX_FRAME_SIZE}")
+            frame_end = self.start + HEADER.size + length
+            if frame_end > self.end:
+                return
+            yield self.view[self.start + HEADER.size:frame_end]
+            self.start = frame_end
+        if self.start == self.end:
+            self.start = self.end = 0
+
+
+class BandSession:
+    """LSL outlets for one band. Survives reconnects, so an app restart keeps the same streams."""
+
+    def __init__(self, index, device_id):
+        self.device_id = device_id  # From the HELLO handshake; None for a sender without one
+        self.connected = False
+        self.used = False           # Claimed by a connection at least once
+        # The first band keeps the original stream names; extra bands get a numeric suffix
+        suffix = '' if index == 1 else f'_{index}'
+
+        # Set up LSL streams
+        # GSR stream: 1 channel (resistance in kOhms)
+        gsr_info = StreamInfo(f'MSBand_GSR{suffix}', 'GSR', 1, 0, 'float32', f'msband_gsr{suffix}')
+        self.gsr_outlet = StreamOutlet(gsr_info)
+
+        # HR stream: 2 channels (heart rate in bpm, quality flag: 1 for Locked, 0 otherwise)
+        hr_info = StreamInfo(f'MSBand_HR{suffix}', 'HR', 2, 0, 'float32', f'msband_hr{suffix}')
+        self.hr_outlet = StreamOutlet(hr_info)
+
+        # Sender clock -> LSL clock mapping, kept across reconnects (same phone clock)
+        self.clock = ClockMapper()
+        # Clock stream: offset (s, LSL - sender UTC), drift (ppm), mean delay above the fit (ms)
+        clock_info = StreamInfo(f'MSBand_ClockSync{suffix}', 'Diagnostics', 3, 0, 'double64', f'msband_clock{suffix}')
+        channels = clock_info.desc().append_child("channels")
+        for label in ("offset_s", "drift_ppm", "mean_delay_ms"):
+            channels.append_child("channel").append_child_value("label", label)
+        self.clock_outlet = StreamOutlet(clock_info)
+
+    def sample_time(self, sender_t):
+        """Feed the clock model with one sender timestamp and return its LSL time."""
+        now = local_clock()
+        self.clock.add(sender_t, now)
+        self.report_clock(sender_t)
+        return self.clock.map(sender_t, now)
+
+    def report_clock(self, sender_t):
+        if not self.clock.updated:
+            return
+        self.clock.updated = False
+        offset = self.clock.map(sender_t) - sender_t
+        drift_ppm = self.clock.drift * 1e6
+        delay_ms = self.clock.mean_delay * 1000.0
+        self.clock_outlet.push_sample([offset, drift_ppm, delay_ms])
+        print(f"[MSBand] Clock {self.gsr_outlet.get_info().name()}: offset {offset:.4f}s, "
+              f"drift {drift_ppm:.1f} ppm, mean delay {delay_ms:.1f} ms")
+
+    def handle_message(self, payload):
+        if is_batch(payload):
+            self.handle_batch(payload)
+            return
+
+        # Legacy CSV message, one sample per frame
+        message = str(payload, 'utf-8')
+
+        # Parse the message
+        parts = message.split(',')
+        if len(parts) < 3:
+            return
+
+        sensor_type = parts[0]
+
+        if sensor_type == 'GSR':
+            if len(parts) != 3:
+                return
+            resistance = float(parts[2])
+            # Push to LSL with the sender's capture time
+            self.gsr_outlet.push_sample([resistance], self.sample_time(parse_sender_time(parts[1])))
+
+        elif sensor_type == 'HR':
+            if len(parts) != 4:
+                return
+            heartrate = float(parts[2])
+            quality = parts[3]
+            quality_flag = 1.0 if quality == 'Locked' else 0.0
+            # Push to LSL with the sender's capture time
+            self.hr_outlet.push_sample([heartrate, quality_flag], self.sample_time(parse_sender_time(parts[1])))
+
+    def handle_batch(self, payload):
+        sensor, records = decode_batch(payload)
+        if len(records) == 0:
+            return
+        # The newest record is the one least delayed by batching, so it feeds the clock model
+        sender_t = records['t'].astype(float)
+        self.sample_time(sender_t[-1])
+        timestamps = self.clock.map(sender_t, local_clock()).tolist()
+
+        # Push the whole batch at once with per-sample sender times
+        if sensor == SENSOR_GSR:
+            self.gsr_outlet.push_chunk(gsr_chunk(records), timestamps)
+        elif sensor == SENSOR_HR:
+            self.hr_outlet.push_chunk(hr_chunk(records), timestamps)
+
+
+class BandConnection:
+    """
+    One accepted TCP connection. It is attached to a session on its first
+    frame: a HELLO handshake names the band, anything else is handled as
+    data of an anonymous band.
+    """
+
+    def __init__(self, conn, peer, sessions):
+        self.conn = conn
+        self.peer = peer
+        self.sessions = sessions
+        self.session = None
+        self.reader = FrameReader()
+        self.malformed = 0
+
+    def _attach(self, device_id):
+        self.session = attach_session(self.sessions, device_id)
+        self.session.connected = True
+        self.session.used = True
+        print(f"[MSBand] Connected: {self.peer} ({device_id or 'no device id'}) "
+              f"-> {self.session.gsr_outlet.get_info().name()}")
+
+    def on_readable(self):
+        """Returns False when the connection should be closed."""
+        try:
+            if self.reader.fill(self.conn) == 0:
+                return False
+            for frame in self.reader.frames():
+                if self.session is None:
+                    device_id = parse_hello(frame)
+                    self._attach(device_id)
+                    if device_id is not None:
+                        continue
+                try:
+                    self.session.handle_message(frame)
+                except ValueError:
+                    self.malformed += 1  # Malformed message (incl. bad batches), keep the stream
+        except (BlockingIOError, InterruptedError):
+            return True
+        except (ConnectionError, FrameError) as e:
+            print(f"[MSBand] Dropping connection from {self.peer}: {e}")
+            return False
+        return True
+
+    def close(self):
+        self.conn.close()
+        if self.session is not None:
+            self.session.connected = False
+
+
+def attach_session(sessions, device_id):
+    """
+    Session for a new connection: the idle session of the same device id
+    (app restart), else the still unclaimed first session, else a new one.
+    Without a device id an idle session is only reused when it is the only
+    one, since several anonymous bands (all via 127.0.0.1) cannot be told apart.
+    """
+    idle = [session for session in sessions if not session.connected]
+    for session in idle:
+        if device_id is not None and session.device_id == device_id:
+            return session
+    if device_id is None and len(sessions) == 1 and idle and idle[0].device_id is None:
+        return idle[0]
+    for session in idle:
+        if not session.used:
+            session.device_id = device_id
+            return session
+    session = BandSession(len(sessions) + 1, device_id)
+    sessions.append(session)
+    return session
+
+
+def start_band_receiver(host=HOST, port=PORT):
+    # Outlets for the first band exist from the start, as before; it is claimed by the first connection
+    sessions = [BandSession(1, None)]
+    sel = selectors.DefaultSelector()
 
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server_socket:
-        server_socket.bind((HOST, PORT))
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server_socket.bind((host, port))
         server_socket.listen()
+        server_socket.setblocking(False)
+        sel.register(server_socket, selectors.EVENT_READ, None)
+        print(f"[MSBand] Listening on {host}:{port}")
 
-        conn, addr = server_socket.accept()
-        with conn:
+        try:
             while True:
-                # Read the length prefix (4 bytes, uint32)
-                data = conn.recv(4)
-                if not data:
-                    break
-                length = struct.unpack('!I', data)[0]
-
-                # Read the message
-                message_data = conn.recv(length)
-                if not message_data:
-                    break
-                message = message_data.decode('utf-8')
-
-                # Parse the message
-                parts = message.split(',')
-                if len(parts) < 3:
-                    continue
-
-                sensor_type = parts[0]
-
-                if sensor_type == 'GSR':
-                    if len(parts) != 3:
+                for key, _ in sel.select():
+                    if key.data is None:
+                        # New band connection
+                        conn, addr = server_socket.accept()
+                        conn.setblocking(False)
+                        sel.register(conn, selectors.EVENT_READ, BandConnection(conn, f"{addr[0]}:{addr[1]}", sessions))
                         continue
-                    resistance = float(parts[2])
-                    # Push to LSL (autogenerate timestamp)
-                    gsr_outlet.push_sample([resistance])
-                    #print(f"Pushed GSR: {resistance}")
 
-                elif sensor_type == 'HR':
-                    if len(parts) != 4:
-                        continue
-                    heartrate = float(parts[2])
-                    quality = parts[3]
-                    quality_flag = 1.0 if quality == 'Locked' else 0.0
-                    # Push to LSL (autogenerate timestamp)
-                    hr_outlet.push_sample([heartrate, quality_flag])
-                    #print(f"Pushed HR: {heartrate}, Quality: {quality_flag}")
+                    connection = key.data
+                    if not connection.on_readable():
+                        sel.unregister(connection.conn)
+                        connection.close()
+                        name = connection.session.device_id if connection.session else None
+                        print(f"[MSBand] Disconnected: {connection.peer} ({name or 'no device id'}, "
+                              f"{connection.malformed} malformed messages, waiting for reconnect)")
+        finally:
+            for key in list(sel.get_map().values()):
+                key.fileobj.close()
+            sel.close()
 
 if __name__ == "__main__":
-    start_band_receiver()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=HOST, help="The ip to listen on")
+    parser.add_argument("--port", type=int, default=PORT, help="The port to listen on")
+    args = parser.parse_args()
+
+    start_band_receiver(args.host, args.port)
\ No newline at end of file
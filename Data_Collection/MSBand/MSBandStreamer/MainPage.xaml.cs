@@ -46,6 +46,9 @@ namespace MSBandStreamer
                 bandClient = await BandClientManager.Instance.ConnectAsync(pairedBands[0]);
                 StatusText.Text += "\nConnected to Band!";
 
+                // Handshake: the band's name lets the receiver keep each band on its own LSL streams
+                await SendTcpMessage($"HELLO,{pairedBands[0].Name}");
+
                 // Start reading sensors (GSR and Heart Rate)
                 await StartSensorReadingsAsync();
             }
@@ -0,0 +1,106 @@
+"""
+Binary batched wire format for MSBand samples.
+
+Every TCP frame is still a big-endian uint32 length prefix followed by the
+payload. A payload is either a legacy UTF-8 CSV message (one sample:
+`GSR,<t>,<kOhm>` or `HR,<t>,<bpm>,<quality>`) or a binary batch:
+
+    offset  size  field
+    0       2     magic  b'MB'
+    2       1     version (1)
+    3       1     sensor  (1 = GSR, 2 = HR)
+    4       2     sample count (uint16, big endian)
+    6       ...   count records, big endian, no padding
+                  GSR: float64 sender time (s since Unix epoch, UTC), float32 resistance (kOhm)
+                  HR:  float64 sender time, float32 heart rate (bpm), uint8 quality (1 = Locked)
+
+Legacy CSV messages always start with an ASCII letter, so the two formats
+cannot be confused.
+
+The first frame of a connection may be a CSV handshake `HELLO,<device id>`
+(the band's Bluetooth name); the receiver uses it to give a reconnecting
+band its own LSL outlets back, since every band relays through 127.0.0.1.
+"""
+import struct
+from datetime import datetime, timezone
+
+import numpy as np
+
+MAGIC = b'MB'
+VERSION = 1
+
+SENSOR_GSR = 1
+SENSOR_HR = 2
+
+BATCH_HEADER = struct.Struct('!2sBBH')
+MAX_BATCH = 0xFFFF
+
+RECORD_DTYPES = {
+    SENSOR_GSR: np.dtype([('t', '>f8'), ('resistance', '>f4')]),
+    SENSOR_HR: np.dtype([('t', '>f8'), ('bpm', '>f4'), ('locked', 'u1')]),
+}
+
+
+HELLO_PREFIX = b'HELLO,'
+
+
+def encode_hello(device_id):
+    return HELLO_PREFIX + device_id.encode('utf-8')
+
+
+def parse_hello(payload):
+    """Device id of a handshake frame, None for any other frame."""
+    if bytes(payload[:len(HELLO_PREFIX)]) != HELLO_PREFIX:
+        return None
+    return str(payload[len(HELLO_PREFIX):], 'utf-8').strip() or None
+
+
+def parse_sender_time(text):
+    """Sender timestamp from the CSV messages ('yyyy-MM-dd HH:mm:ss.fffff', UTC) -> Unix seconds."""
+    return datetime.fromisoformat(text).replace(tzinfo=timezone.utc).timestamp()
+
+
+class ProtocolError(ValueError):
+    """Raised for a binary payload that cannot be decoded."""
+
+
+def is_batch(payload):
+    return payload[:2] == MAGIC
+
+
+def decode_batch(payload):
+    """Decode a binary batch into (sensor, structured array). The array is a view on `payload`."""
+    if len(payload) < BATCH_HEADER.size:
+        raise ProtocolError("Truncated batch header")
+    magic, version, sensor, count = BATCH_HEADER.unpack_from(payload)
+    if magic != MAGIC:
+        raise ProtocolError("Not a binary batch")
+    if version != VERSION:
+        raise ProtocolError(f"Unsupported batch version {version}")
+    dtype = RECORD_DTYPES.get(sensor)
+    if dtype is None:
+        raise ProtocolError(f"Unknown sensor id {sensor}")
+    if len(payload) != BATCH_HEADER.size + count * dtype.itemsize:
+        raise ProtocolError(f"Batch length does not match {count} x {dtype.itemsize} byte records")
+    return sensor, np.frombuffer(payload, dtype=dtype, count=count, offset=BATCH_HEADER.size)
+
+
+def encode_batch(sensor, records):
+    """Encode a batch. `records` is a structured array (or list of tuples) in the sensor's record layout."""
+    records = np.asarray(records, dtype=RECORD_DTYPES[sensor])
+    if len(records) > MAX_BATCH:
+        raise ValueError(f"At most {MAX_BATCH} samples per batch")
+    return BATCH_HEADER.pack(MAGIC, VERSION, sensor, len(records)) + records.tobytes()
+
+
+def gsr_chunk(records):
+    """GSR records -> (n, 1) float32 array for StreamOutlet.push_chunk."""
+    return records['resistance'].astype(np.float32).reshape(-1, 1)
+
+
+def hr_chunk(records):
+    """HR records -> (n, 2) float32 array (bpm, quality flag) for StreamOutlet.push_chunk."""
+    chunk = np.empty((len(records), 2), dtype=np.float32)
+    chunk[:, 0] = records['bpm']
+    chunk[:, 1] = records['locked']
+    return chunk
\ No newline at end of file
@@ -0,0 +1,270 @@
+"""
+MSBand sender simulator and BandReceiver stress harness.
+
+Speaks the MSBandStreamer TCP protocol (length-prefixed CSV, or binary
+batches from band_protocol.py) so the receiver can be exercised on any OS
+without the Windows app or a physical band. BandReceiver.py is started as a
+subprocess and its MSBand_GSR outlet is read back through a local inlet; the
+GSR value carries a sequence number so every sample can be matched to its
+send time.
+
+    python band_simulator.py --bench                  # ramp rates, report max sustainable rate
+    python band_simulator.py --bench --format binary --batch 32
+    python band_simulator.py --chaos --rate 200       # fragmentation, malformed frames, disconnects
+
+Run it on a machine without a live band: the harness reads the stream named MSBand_GSR.
+"""
+import argparse
+import random
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+from pylsl import StreamInlet, local_clock, resolve_byprop
+
+from band_protocol import RECORD_DTYPES, SENSOR_GSR, encode_batch, encode_hello
+
+# --- SIMULATOR CONFIGURATION ---
+RECEIVER_SCRIPT = Path(__file__).parent / "BandReceiver.py"
+BENCH_PORT = 5098
+BENCH_RATES = (100, 1000, 5000, 20000, 50000)  # Messages (samples) per second
+BENCH_DURATION = 5.0       # Seconds per rate step
+DRAIN_TIME = 1.0           # Seconds to wait for the receiver to catch up
+SUSTAINED_DELIVERY = 0.999 # A rate is sustainable if this fraction arrives ...
+SUSTAINED_P99 = 0.1        # ... with p99 send-to-inlet latency below this (s)
+TICK = 0.001               # Pacing granularity (s)
+
+HEADER = struct.Struct('!I')
+
+
+def frame(payload):
+    return HEADER.pack(len(payload)) + payload
+
+
+def csv_frame(seq):
+    timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')[:-1]
+    return frame(f"GSR,{timestamp},{seq}".encode())
+
+
+def batch_frame(seqs):
+    records = np.empty(len(seqs), dtype=RECORD_DTYPES[SENSOR_GSR])
+    records['t'] = time.time()
+    records['resistance'] = seqs
+    return frame(encode_batch(SENSOR_GSR, records))
+
+
+def malformed_frame(rng):
+    return rng.choice([
+        frame(b"GSR,not-enough"),
+        frame(b"GSR,2026-01-01 00:00:00.00000,abc"),
+        frame(b"HR,2026-01-01 00:00:00.000,70"),
+        frame(b"\xff\xfe\xfd invalid utf-8"),
+        frame(b"MB\x09\x01\x00\x01" + bytes(12)),   # Unsupported version
+        frame(b"MB\x01\x01\x00\x05" + bytes(12)),   # Count does not match length
+    ])
+
+
+class BandSimulator:
+    """TCP client that plays the role of the MSBandStreamer app."""
+
+    def __init__(self, host, port, fmt="csv", batch=1, fragment=False, malformed=0.0,
+                 disconnect_every=None, seed=0, device_id="SIM Band 1"):
+        self.address = (host, port)
+        self.device_id = device_id    # Sent as the HELLO handshake on every connect (None: no handshake)
+        self.fmt = fmt
+        self.batch = batch if fmt == "binary" else 1
+        self.fragment = fragment
+        self.malformed = malformed
+        self.disconnect_every = disconnect_every
+        self.rng = random.Random(seed)
+        self.sock = None
+        self.send_times = {}          # seq -> local_clock() at send
+        self.lost_in_disconnect = 0   # Samples in frames cut off on purpose
+        self.malformed_sent = 0
+        self.reconnects = 0
+
+    def connect(self):
+        self.sock = socket.create_connection(self.address)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.device_id is not None:
+            self.sock.sendall(frame(encode_hello(self.device_id)))
+
+    def _send(self, data):
+        if not self.fragment:
+            self.sock.sendall(data)
+            return
+        # Split at random byte boundaries so frames straddle TCP segments
+        i = 0
+        while i < len(data):
+            n = self.rng.randint(1, max(1, min(len(data) - i, 64)))
+            self.sock.sendall(data[i:i + n])
+            i += n
+
+    def _disconnect_mid_frame(self, seq):
+        data = csv_frame(seq) if self.fmt == "csv" else batch_frame([seq])
+        self.sock.sendall(data[:self.rng.randint(1, len(data) - 1)])
+        self.sock.close()
+        self.lost_in_disconnect += 1
+        time.sleep(0.05)
+        self.connect()
+        self.reconnects += 1
+
+    def run(self, rate, duration, seq=0):
+        """Send `rate` samples/s for `duration` seconds. Returns the next sequence number."""
+        if self.sock is None:
+            self.connect()
+        start = local_clock()
+        next_disconnect = start + self.disconnect_every if self.disconnect_every else None
+        sent_target = 0
+        while True:
+            now = local_clock()
+            elapsed = now - start
+            if elapsed >= duration:
+                break
+            due = int(elapsed * rate) - sent_target
+            frames = []
+            while due >= self.batch:
+                seqs = list(range(seq, seq + self.batch))
+                frames.append(csv_frame(seq) if self.fmt == "csv" else batch_frame(seqs))
+                t = local_clock()
+                for s in seqs:
+                    self.send_times[s] = t
+                seq += self.batch
+                sent_target += self.batch
+                due -= self.batch
+                if self.malformed and self.rng.random() < self.malformed:
+                    frames.append(malformed_frame(self.rng))
+                    self.malformed_sent += 1
+            if frames:
+                self._send(b"".join(frames))
+            if next_disconnect is not None and now >= next_disconnect:
+                self._disconnect_mid_frame(seq)
+                seq += 1
+                next_disconnect = now + self.disconnect_every
+            time.sleep(TICK)
+        return seq
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+
+
+def collect(inlet, stop, received):
+    """Pull GSR from the receiver, recording (sequence, pull time)."""
+    while not stop.is_set():
+        data, _ = inlet.pull_chunk(timeout=0.0)
+        if data:
+            now = local_clock()
+            received.extend((int(sample[0]), now) for sample in data)
+        else:
+            time.sleep(TICK)
+
+
+def start_receiver(port):
+    receiver = subprocess.Popen(
+        [sys.executable, str(RECEIVER_SCRIPT), "--port", str(port)],
+        cwd=RECEIVER_SCRIPT.parent, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    found = resolve_byprop("name", "MSBand_GSR", timeout=10.0)
+    if not found:
+        receiver.terminate()
+        raise RuntimeError("Receiver GSR stream did not appear")
+    inlet = StreamInlet(found[0], max_buflen=360)
+    inlet.open_stream(timeout=5.0)
+    return receiver, inlet
+
+
+def measure(sim, inlet, rate, duration, seq):
+    received = []
+    stop = threading.Event()
+    collector = threading.Thread(target=collect, args=(inlet, stop, received), daemon=True)
+    collector.start()
+    first = seq
+    t0 = local_clock()
+    seq = sim.run(rate, duration, seq)
+    wall = local_clock() - t0
+    time.sleep(DRAIN_TIME)
+    stop.set()
+    collector.join()
+
+    sent = [s for s in range(first, seq) if s in sim.send_times]
+    got = {s: t for s, t in received if first <= s < seq}
+    latency = np.array([got[s] - sim.send_times[s] for s in sent if s in got])
+    result = {
+        "rate": rate,
+        "sent": len(sent),
+        "send_rate": round(len(sent) / wall, 1),
+        "received": len(got),
+        "delivered": len(got) / len(sent) if sent else 0.0,
+    }
+    if len(latency):
+        p50, p99 = np.percentile(latency, [50, 99])
+        result.update(p50_ms=round(p50 * 1000, 2), p99_ms=round(p99 * 1000, 2),
+                      max_ms=round(float(latency.max()) * 1000, 2))
+    return result, seq
+
+
+def bench(args):
+    receiver, inlet = start_receiver(args.port)
+    sim = BandSimulator("127.0.0.1", args.port, args.format, args.batch)
+    results, seq = [], 0
+    try:
+        for rate in args.rates:
+            result, seq = measure(sim, inlet, rate, args.duration, seq)
+            results.append(result)
+            print(f"{rate:>7}/s  sent {result['send_rate']:>9}/s  delivered {result['delivered'] * 100:7.3f}%  "
+                  f"p50 {result.get('p50_ms', '-')} ms  p99 {result.get('p99_ms', '-')} ms", flush=True)
+    finally:
+        sim.close()
+        receiver.terminate()
+        receiver.wait()
+
+    sustained = [r["rate"] for r in results
+                 if r["delivered"] >= SUSTAINED_DELIVERY and r.get("p99_ms", float("inf")) < SUSTAINED_P99 * 1000]
+    print(f"\nMax sustainable rate ({args.format}, batch {sim.batch}): {max(sustained) if sustained else 'none'} msgs/s")
+
+
+def chaos(args):
+    receiver, inlet = start_receiver(args.port)
+    sim = BandSimulator("127.0.0.1", args.port, args.format, args.batch, fragment=True,
+                        malformed=args.malformed, disconnect_every=args.disconnect_every)
+    try:
+        result, _ = measure(sim, inlet, args.rate, args.duration, 0)
+        survived = receiver.poll() is None
+    finally:
+        sim.close()
+        receiver.terminate()
+        receiver.wait()
+
+    lost = result["sent"] - result["received"]
+    print(f"Sent {result['sent']} samples in fragmented frames, {sim.malformed_sent} malformed frames, "
+          f"{sim.reconnects} mid-frame disconnects")
+    print(f"Received {result['received']} ({lost} missing), p99 latency {result.get('p99_ms', '-')} ms")
+    print("PASS" if lost == 0 and survived else "FAIL")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate MSBandStreamer and stress BandReceiver")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--bench", action="store_true", help="Ramp message rates and report throughput/latency")
+    mode.add_argument("--chaos", action="store_true", help="Fragment frames, inject malformed frames, disconnect")
+    parser.add_argument("--format", choices=("csv", "binary"), default="csv", help="Wire format to send")
+    parser.add_argument("--batch", type=int, default=16, help="Samples per binary batch frame")
+    parser.add_argument("--rates", type=int, nargs="+", default=list(BENCH_RATES), help="Rates for --bench (msgs/s)")
+    parser.add_argument("--rate", type=int, default=200, help="Rate for --chaos (msgs/s)")
+    parser.add_argument("--duration", type=float, default=BENCH_DURATION, help="Seconds per run")
+    parser.add_argument("--malformed", type=float, default=0.05, help="Probability of a malformed frame (--chaos)")
+    parser.add_argument("--disconnect-every", type=float, default=1.0, help="Seconds between mid-frame disconnects (--chaos)")
+    parser.add_argument("--port", type=int, default=BENCH_PORT, help="TCP port for the receiver under test")
+    args = parser.parse_args()
+
+    if args.bench:
+        bench(args)
+    else:
+        chaos(args)
\ No newline at end of file
@@ -0,0 +1,153 @@
+import numpy as np
+from pylsl import StreamInfo, StreamOutlet
+
+# --- BAND POWER CONFIGURATION ---
+EEG_SRATE = 256.0
+EEG_CHANNELS = ("TP9", "AF7", "AF8", "TP10")   # First 4 values of /muse/eeg
+WINDOW_SEC = 2.0        # Analysis window
+HOP_SEC = 0.25          # New estimate every HOP_SEC (-> 4 Hz output)
+SEGMENT_SEC = 1.0       # Welch segment length inside the window
+SEGMENT_OVERLAP = 0.5   # Welch segment overlap
+
+BANDS = {
+    "delta": (1.0, 4.0),
+    "theta": (4.0, 8.0),
+    "alpha": (8.0, 13.0),
+    "beta": (13.0, 30.0),
+    "gamma": (30.0, 44.0),
+}
+
+BAND_STREAM_NAME = "muse_bandpower"
+
+
+class BandPowerEngine:
+    """
+    Incremental Welch band-power estimator for raw Muse EEG.
+
+    Samples are written into a double-length ring (each sample stored twice,
+    W apart) so the latest window is always a contiguous view. Every hop the
+    window is split into overlapping Hann segments and transformed into
+    preallocated buffers; nothing is allocated per sample.
+    """
+
+    def __init__(self, srate=EEG_SRATE, n_channels=len(EEG_CHANNELS)):
+        self.srate = srate
+        self.n_channels = n_channels
+        self.window = int(round(WINDOW_SEC * srate))
+        self.hop = int(round(HOP_SEC * srate))
+        self.seg_len = int(round(SEGMENT_SEC * srate))
+        self.seg_step = max(1, int(round(self.seg_len * (1.0 - SEGMENT_OVERLAP))))
+        self.n_segments = (self.window - self.seg_len) // self.seg_step + 1
+
+        # Ring buffer and write position
+        self.ring = np.zeros((n_channels, 2 * self.window), dtype=np.float64)
+        self.pos = 0
+        self.filled = 0
+        self.since_last = 0
+
+        # Welch "plan": taper, scaling and reusable work buffers
+        self.taper = np.hanning(self.seg_len)
+        self.scale = 2.0 / (srate * np.sum(self.taper ** 2))
+        n_freqs = self.seg_len // 2 + 1
+        self.segments = np.empty((n_channels, self.n_segments, self.seg_len))
+        self.spectrum = np.empty((n_channels, self.n_segments, n_freqs), dtype=np.complex128)
+        self.power = np.empty((n_channels, self.n_segments, n_freqs))
+        self.power_imag = np.empty_like(self.power)
+        self.psd = np.empty((n_channels, n_freqs))
+
+        freqs = np.fft.rfftfreq(self.seg_len, 1.0 / srate)
+        self.df = freqs[1] - freqs[0]
+        self.band_slices = [
+            slice(np.searchsorted(freqs, lo), np.searchsorted(freqs, hi)) for lo, hi in BANDS.values()
+        ]
+        self.band_power = np.empty((n_channels, len(BANDS)))
+
+    def push(self, sample):
+        """Add one EEG sample. Returns the band-power matrix when a new estimate is ready, else None."""
+        col = self.pos
+        for ch in range(self.n_channels):
+            value = sample[ch]
+            self.ring[ch, col] = value
+            self.ring[ch, col + self.window] = value
+        self.pos = (col + 1) % self.window
+        if self.filled < self.window:
+            self.filled += 1
+        self.since_last += 1
+
+        if self.filled == self.window and self.since_last >= self.hop:
+            self.since_last = 0
+            return self.compute()
+        return None
+
+    def push_chunk(self, chunk):
+        """Add an (n_samples, n_channels) chunk. Returns the list of estimates produced."""
+        chunk = np.asarray(chunk, dtype=np.float64)[:, :self.n_channels]
+        results = []
+        start = 0
+        while start < len(chunk):
+            # Copy up to the next hop boundary (or ring wrap) in one slice
+            if self.filled < self.window:
+                to_boundary = self.window - self.filled
+            else:
+                to_boundary = max(1, self.hop - self.since_last)
+            n = min(len(chunk) - start, self.window - self.pos, to_boundary)
+            block = chunk[start:start + n].T
+            self.ring[:, self.pos:self.pos + n] = block
+            self.ring[:, self.pos + self.window:self.pos + self.window + n] = block
+            self.pos = (self.pos + n) % self.window
+            self.filled = min(self.window, self.filled + n)
+            self.since_last += n
+            start += n
+            if self.filled == self.window and self.since_last >= self.hop:
+                self.since_last = 0
+                results.append(self.compute().copy())
+        return results
+
+    def compute(self):
+        """Welch PSD over the current window, integrated per band. Returns (n_channels, n_bands)."""
+        window = self.ring[:, self.pos:self.pos + self.window]
+        views = np.lib.stride_tricks.sliding_window_view(window, self.seg_len, axis=-1)[:, ::self.seg_step]
+        np.subtract(views, views.mean(axis=-1, keepdims=True), out=self.segments)
+        self.segments *= self.taper
+        np.fft.rfft(self.segments, axis=-1, out=self.spectrum)
+
+        np.square(self.spectrum.real, out=self.power)
+        np.square(self.spectrum.imag, out=self.power_imag)
+        self.power += self.power_imag
+        np.mean(self.power, axis=1, out=self.psd)
+        self.psd *= self.scale
+
+        for i, band in enumerate(self.band_slices):
+            np.sum(self.psd[:, band], axis=-1, out=self.band_power[:, i])
+        self.band_power *= self.df
+        return self.band_power
+
+
+def engagement_index(band_power):
+    """Pope et al. engagement index beta / (alpha + theta), averaged over channels."""
+    names = list(BANDS)
+    mean = np.nanmean(band_power, axis=0)
+    denom = mean[names.index("alpha")] + mean[names.index("theta")]
+    return float(mean[names.index("beta")] / denom) if denom > 0 else float("nan")
+
+
+def setup_band_outlet(name=BAND_STREAM_NAME, source_id=BAND_STREAM_NAME):
+    """One outlet carrying log10 band power per channel plus the engagement index."""
+    ch_names = [f"{ch}_{band}" for ch in EEG_CHANNELS for band in BANDS] + ["engagement_index"]
+    info = StreamInfo(name, "Bands", len(ch_names), 1.0 / HOP_SEC, "float32", source_id)
+    desc = info.desc()
+    desc.append_child_value("window_s", str(WINDOW_SEC))
+    desc.append_child_value("hop_s", str(HOP_SEC))
+    desc.append_child_value("method", "welch_hann")
+    channels = desc.append_child("channels")
+    for ch_name in ch_names:
+        unit = "ratio" if ch_name == "engagement_index" else "log10(uV^2)"
+        channels.append_child("channel").append_child_value("label", ch_name).append_child_value("unit", unit)
+    return StreamOutlet(info)
+
+
+def band_sample(band_power):
+    """Flatten an estimate into the outlet's channel order."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_power = np.log10(band_power)
+    return np.append(log_power.ravel(), engagement_index(band_power)).astype(np.float32)
\ No newline at end of file
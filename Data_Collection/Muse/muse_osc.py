@@ -1,8 +1,13 @@
 import argparse
+import selectors
+import socket
+import sys
 import time
+from bisect import bisect_right
 from pythonosc.dispatcher import Dispatcher
-from pythonosc.osc_server import BlockingOSCUDPServer
-from pylsl import StreamInfo, StreamOutlet
+from pylsl import StreamInfo, StreamOutlet, local_clock
+
+from band_power import BAND_STREAM_NAME, BandPowerEngine, band_sample, setup_band_outlet
 
 # --- HARDCODED CONFIGURATION ---
 STREAM_CONFIG = {
@@ -22,52 +27,315 @@ STREAM_CONFIG = {
     "/muse/elements/jaw_clench": ("muse_jaw_clench", 1, "Markers", "int32"),
 }
 
-outlets = {}
-packet_count = 0
-start_time = time.time()
-
-def setup_outlets():
-    print("--- Initializing LSL Outlets ---")
-    for path, config in STREAM_CONFIG.items():
-        name, ch_count, st_type, fmt = config
-        info = StreamInfo(name, st_type, ch_count, 0.0, fmt)
-        outlets[path] = StreamOutlet(info)
-        print(f"OK: {path} -> LSL: {name}")
-    print("---------------------------------\n")
-
-def relay_handler(address, *args):
-    global packet_count
-    if address in outlets:
+# Nominal Mind Monitor send rates (messages/s). 0 = event driven, no loss estimate.
+EXPECTED_RATES = {
+    "/muse/eeg": 256.0,
+    "/muse/optics": 64.0,
+    "/muse/acc": 52.0,
+    "/muse/gyro": 52.0,
+    "/muse/elements/alpha_absolute": 10.0,
+    "/muse/elements/beta_absolute": 10.0,
+    "/muse/elements/delta_absolute": 10.0,
+    "/muse/elements/theta_absolute": 10.0,
+    "/muse/elements/gamma_absolute": 10.0,
+    "/muse/elements/horseshoe": 10.0,
+    "/muse/batt": 0.1,
+    "/muse/elements/touching_forehead": 10.0,
+    "/muse/elements/blink": 0.0,
+    "/muse/elements/jaw_clench": 0.0,
+}
+
+# --- DIAGNOSTICS ---
+DIAG_STREAM_NAME = "muse_relay_diag"
+DIAG_INTERVAL = 1.0                # Seconds between diagnostics samples
+GAP_FACTOR = 2.5                   # Inter-arrival > GAP_FACTOR * period counts as a gap
+INTERARRIVAL_BINS_MS = (1, 2, 5, 10, 20, 50, 100, 250, 500, 1000)
+
+MAX_DATAGRAM = 65535
+
+
+def namespaced(name, participant_id):
+    """Stream name for a headset; the bare name keeps single-headset recordings unchanged."""
+    return f"{name}_{participant_id}" if participant_id else name
+
+
+def parse_binding(text):
+    """Parse a `PORT:PARTICIPANT_ID` command line binding."""
+    port, _, participant_id = text.partition(":")
+    try:
+        port = int(port)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected PORT:PARTICIPANT_ID, got '{text}'")
+    if not 0 < port < 65536:
+        raise argparse.ArgumentTypeError(f"Port out of range in '{text}'")
+    return port, participant_id
+
+
+def read_kernel_drops(port):
+    """Sum of the kernel 'drops' counter for UDP sockets bound to `port` (Linux only, else None)."""
+    if not sys.platform.startswith("linux"):
+        return None
+    port_hex = f"{port:04X}"
+    drops = None
+    for table in ("/proc/net/udp", "/proc/net/udp6"):
         try:
-            outlets[address].push_sample(args)
-            packet_count += 1
-            
+            with open(table) as f:
+                next(f)  # header
+                for line in f:
+                    fields = line.split()
+                    if fields[1].rsplit(":", 1)[1] == port_hex:
+                        drops = (drops or 0) + int(fields[-1])
+        except (OSError, IndexError, ValueError):
+            continue
+    return drops
+
+
+class AddressStats:
+    """Receive statistics for a single OSC address."""
+    __slots__ = ("expected_rate", "count", "window_count", "last_arrival",
+                 "gaps", "max_gap", "histogram")
+
+    def __init__(self, expected_rate):
+        self.expected_rate = expected_rate
+        self.count = 0                  # Total messages since start
+        self.window_count = 0           # Messages since last diagnostics sample
+        self.last_arrival = None
+        self.gaps = 0                   # Inter-arrivals longer than GAP_FACTOR periods
+        self.max_gap = 0.0              # Longest inter-arrival (s) in the current window
+        self.histogram = [0] * (len(INTERARRIVAL_BINS_MS) + 1)
+
+    def record(self, t):
+        self.count += 1
+        self.window_count += 1
+        if self.last_arrival is not None:
+            dt = t - self.last_arrival
+            self.histogram[bisect_right(INTERARRIVAL_BINS_MS, dt * 1000.0)] += 1
+            if dt > self.max_gap:
+                self.max_gap = dt
+            if self.expected_rate > 0 and dt * self.expected_rate > GAP_FACTOR:
+                self.gaps += 1
+        self.last_arrival = t
+
+
+class RelayStats:
+    """Per-address rate/loss accounting published on a diagnostics LSL stream."""
+
+    def __init__(self, port, paths, participant_id=""):
+        self.port = port
+        self.participant_id = participant_id
+        self.paths = list(paths)
+        self.addresses = {p: AddressStats(EXPECTED_RATES.get(p, 0.0)) for p in self.paths}
+        self.busy_time = 0.0            # Time spent inside the relay handler (s)
+        self.kernel_drops_start = read_kernel_drops(port)  # None until the socket is bound; see kernel_drops()
+        self.window_start = local_clock()
+        self.outlet = self._setup_outlet()
+
+    def _setup_outlet(self):
+        ch_names = []
+        for path in self.paths:
+            name = STREAM_CONFIG[path][0]
+            ch_names += [f"{name}_rate_hz", f"{name}_loss_pct", f"{name}_gaps", f"{name}_max_gap_ms"]
+        ch_names += ["kernel_drops", "relay_busy_pct"]
+
+        info = StreamInfo(namespaced(DIAG_STREAM_NAME, self.participant_id), "Diagnostics", len(ch_names), 0.0,
+                          "float32", f"muse_relay_diag_{self.participant_id or self.port}")
+        info.desc().append_child_value("interval_s", str(DIAG_INTERVAL))
+        channels = info.desc().append_child("channels")
+        for name in ch_names:
+            channels.append_child("channel").append_child_value("label", name)
+        return StreamOutlet(info)
+
+    def record(self, address, t):
+        self.addresses[address].record(t)
+
+    def kernel_drops(self):
+        drops = read_kernel_drops(self.port)
+        if drops is None:
+            return float("nan")
+        if self.kernel_drops_start is None:
+            # No row for the port when the stats were created (socket not bound yet): count from now
+            self.kernel_drops_start = drops
+        return float(drops - self.kernel_drops_start)
+
+    def maybe_report(self):
+        now = local_clock()
+        elapsed = now - self.window_start
+        if elapsed < DIAG_INTERVAL:
+            return
+
+        sample = []
+        for path in self.paths:
+            s = self.addresses[path]
+            rate = s.window_count / elapsed
+            if s.expected_rate > 0:
+                loss_pct = max(0.0, 1.0 - rate / s.expected_rate) * 100.0
+            else:
+                loss_pct = float("nan")
+            sample += [rate, loss_pct, float(s.gaps), s.max_gap * 1000.0]
+            s.window_count = 0
+            s.max_gap = 0.0
+        sample += [self.kernel_drops(), self.busy_time / elapsed * 100.0]
+
+        self.outlet.push_sample(sample)
+        self.busy_time = 0.0
+        self.window_start = now
+
+    def summary(self):
+        print("\n--- Receive statistics ---")
+        print(f"Kernel drops: {self.kernel_drops()}")
+        labels = [f"<{b}ms" for b in INTERARRIVAL_BINS_MS] + [f">={INTERARRIVAL_BINS_MS[-1]}ms"]
+        for path in self.paths:
+            s = self.addresses[path]
+            if s.count == 0:
+                continue
+            hist = " ".join(f"{label}:{n}" for label, n in zip(labels, s.histogram) if n)
+            print(f"{path}: {s.count} msgs, {s.gaps} gaps | {hist}")
+
+
+class HeadsetRelay:
+    """Relays one Mind Monitor OSC feed (one UDP port) to its own set of LSL outlets."""
+
+    def __init__(self, ip, port, participant_id="", rcvbuf=0, band_power=False):
+        self.port = port
+        self.participant_id = participant_id
+        self.packet_count = 0
+        self.outlets = {}
+        self.setup_outlets()
+
+        # Bind before RelayStats so its kernel drop baseline finds the port in /proc/net/udp
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if rcvbuf > 0:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        self.sock.bind((ip, port))
+        self.sock.setblocking(False)
+        self.rcvbuf = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+        self.stats = RelayStats(port, STREAM_CONFIG.keys(), participant_id)
+
+        # Optional band power computed here from raw /muse/eeg
+        self.band_engine = None
+        self.band_outlet = None
+        if band_power:
+            self.band_engine = BandPowerEngine()
+            self.band_outlet = setup_band_outlet(
+                namespaced(BAND_STREAM_NAME, participant_id),
+                f"muse_{participant_id}_bandpower" if participant_id else BAND_STREAM_NAME,
+            )
+
+        self.dispatcher = Dispatcher()
+        for path in STREAM_CONFIG.keys():
+            self.dispatcher.map(path, self.relay_handler)
+
+    def setup_outlets(self):
+        label = f" [{self.participant_id}]" if self.participant_id else ""
+        print(f"--- Initializing LSL Outlets{label} ---")
+        for path, config in STREAM_CONFIG.items():
+            name, ch_count, st_type, fmt = config
+            name = namespaced(name, self.participant_id)
+            source_id = f"muse_{self.participant_id}_{config[0]}" if self.participant_id else ""
+            info = StreamInfo(name, st_type, ch_count, 0.0, fmt, source_id)
+            if self.participant_id:
+                info.desc().append_child_value("participant_id", self.participant_id)
+            self.outlets[path] = StreamOutlet(info)
+            print(f"OK: {path} -> LSL: {name}")
+        print("---------------------------------\n")
+
+    def relay_handler(self, address, *args):
+        if address in self.outlets:
+            t0 = time.perf_counter()
+            now = local_clock()
+            self.stats.record(address, now)
+            try:
+                self.outlets[address].push_sample(args)
+                self.packet_count += 1
+
+                if self.band_engine is not None and address == "/muse/eeg":
+                    band_power = self.band_engine.push(args)
+                    if band_power is not None:
+                        self.band_outlet.push_sample(band_sample(band_power), now)
+            except Exception as e:
+                print(f"\nError pushing {address} ({self.port}): {e}")
+            self.stats.busy_time += time.perf_counter() - t0
+
+    def on_readable(self):
+        """Drain every datagram queued on the socket."""
+        while True:
+            try:
+                data, client_address = self.sock.recvfrom(MAX_DATAGRAM)
+            except (BlockingIOError, InterruptedError):
+                return
+            try:
+                self.dispatcher.call_handlers_for_packet(data, client_address)
+            except Exception as e:
+                print(f"\nMalformed OSC packet on port {self.port}: {e}")
+
+    def close(self):
+        self.sock.close()
+
+
+def serve_forever(relays):
+    """Multiplex all headset sockets on a single selector loop."""
+    sel = selectors.DefaultSelector()
+    for relay in relays:
+        sel.register(relay.sock, selectors.EVENT_READ, relay)
+
+    start_time = time.time()
+    last_status = 0
+    try:
+        while True:
+            for key, _ in sel.select(timeout=DIAG_INTERVAL / 2):
+                key.data.on_readable()
+            for relay in relays:
+                relay.stats.maybe_report()
+
             # Print status message every 100 packets
-            if packet_count % 100 == 0:
+            total = sum(r.packet_count for r in relays)
+            if total // 100 != last_status // 100:
+                last_status = total
                 elapsed = round(time.time() - start_time, 1)
-                print(f"[{elapsed}s] Receiving data... Total packets relayed: {packet_count}", end='\r')
-                
-        except Exception as e:
-            print(f"\nError pushing {address}: {e}")
+                print(f"[{elapsed}s] Receiving data... Total packets relayed: {total}", end='\r')
+    finally:
+        sel.close()
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--ip", default="0.0.0.0", help="The ip to listen on")
-    parser.add_argument("--port", type=int, default=5000, help="The port to listen on")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--port", type=int, default=5000, help="The port to listen on (single headset)")
+    target.add_argument("--bind", type=parse_binding, action="append", metavar="PORT:PARTICIPANT_ID",
+                        help="Relay a headset on PORT with stream names suffixed by PARTICIPANT_ID (repeatable)")
+    parser.add_argument("--rcvbuf", type=int, default=0, help="Socket receive buffer size in bytes (0 = OS default)")
+    parser.add_argument("--band-power", action="store_true",
+                        help=f"Compute band power from raw EEG and publish it on {BAND_STREAM_NAME}")
     args = parser.parse_args()
 
-    setup_outlets()
+    bindings = args.bind or [(args.port, "")]
+    # Checked before any socket is bound, so a clash never surfaces as a bare OSError
+    ports = [port for port, _ in bindings]
+    participant_ids = [participant_id for _, participant_id in bindings]
+    if len(set(ports)) != len(ports):
+        parser.error(f"--bind ports must be unique, got {ports}")
+    if len(set(participant_ids)) != len(participant_ids):
+        parser.error(f"--bind participant IDs must be unique (they name the LSL streams), got {participant_ids}")
+    relays = [HeadsetRelay(args.ip, port, participant_id, args.rcvbuf, args.band_power)
+              for port, participant_id in bindings]
 
-    dispatcher = Dispatcher()
-    for path in STREAM_CONFIG.keys():
-        dispatcher.map(path, relay_handler)
-
-    server = BlockingOSCUDPServer((args.ip, args.port), dispatcher)
-    
-    print(f"Relay active on {args.ip}:{args.port}.")
+    for relay in relays:
+        label = f" -> {relay.participant_id}" if relay.participant_id else ""
+        print(f"Relay active on {args.ip}:{relay.port}{label} (receive buffer {relay.rcvbuf} bytes).")
+    print(f"Diagnostics on LSL: {DIAG_STREAM_NAME}")
+    if args.band_power:
+        print(f"Band power on LSL: {BAND_STREAM_NAME} (the *_absolute elements can be disabled in Mind Monitor)")
     print("Streaming Mind Monitor OSC to LSL. Press Ctrl+C to stop.\n")
-    
+
     try:
-        server.serve_forever()
+        serve_forever(relays)
     except KeyboardInterrupt:
-        print(f"\n\nRelay stopped. Total packets processed: {packet_count}")
\ No newline at end of file
+        print(f"\n\nRelay stopped. Total packets processed: {sum(r.packet_count for r in relays)}")
+        for relay in relays:
+            if relay.participant_id:
+                print(f"\n[{relay.participant_id} @ port {relay.port}]", end="")
+            relay.stats.summary()
+    finally:
+        for relay in relays:
+            relay.close()
\ No newline at end of file
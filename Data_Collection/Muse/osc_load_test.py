@@ -0,0 +1,235 @@
+"""
+OSC load generator and throughput/latency benchmark for muse_osc.py.
+
+Replays Mind Monitor style OSC traffic (synthetic, or re-encoded from an XDF
+recording) at 1x-50x real time into a relay started as a subprocess, and
+measures relay throughput, EEG drop rate and send-to-inlet latency through a
+local LSL inlet.
+
+The last /muse/eeg channel carries a sequence number so each received sample
+can be matched to its send time.
+
+    python osc_load_test.py --speed 1 10 50
+    python osc_load_test.py --xdf ../../Data_Processing/data/muse_2_mins.xdf --speed 1 5
+"""
+import argparse
+import json
+import platform
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from pylsl import StreamInlet, local_clock, resolve_byprop
+from pythonosc.osc_message_builder import OscMessageBuilder
+
+from muse_osc import EXPECTED_RATES, STREAM_CONFIG
+
+# --- BENCHMARK CONFIGURATION ---
+RELAY_SCRIPT = Path(__file__).parent / "muse_osc.py"
+BENCH_PORT = 5099
+BENCH_PARTICIPANT = "bench"
+DURATION = 20.0          # Seconds of traffic (media time) per run
+DRAIN_TIME = 1.0         # Seconds to wait for stragglers after sending
+SEED = 1234
+EEG_ADDRESS = "/muse/eeg"
+
+# OpenMuse recordings use different stream names; map them (by name prefix) onto OSC addresses
+OPENMUSE_STREAMS = {
+    "Muse-EEG": [("/muse/eeg", slice(0, 8))],
+    "Muse-OPTICS": [("/muse/optics", slice(0, 16))],
+    "Muse-ACCGYRO": [("/muse/acc", slice(0, 3)), ("/muse/gyro", slice(3, 6))],
+}
+
+
+def encode(address, values, fmt):
+    builder = OscMessageBuilder(address=address)
+    for v in values:
+        if fmt == "int32":
+            builder.add_arg(int(v), OscMessageBuilder.ARG_TYPE_INT)
+        else:
+            builder.add_arg(float(v), OscMessageBuilder.ARG_TYPE_FLOAT)
+    return builder.build().dgram
+
+
+def synthetic_schedule(duration, seed=SEED):
+    """Messages for every STREAM_CONFIG address at its nominal Mind Monitor rate."""
+    rng = np.random.default_rng(seed)
+    times, dgrams, is_eeg = [], [], []
+    for address, (_, ch_count, _, fmt) in STREAM_CONFIG.items():
+        rate = EXPECTED_RATES.get(address, 0.0) or 0.5   # Event streams: occasional events
+        n = int(duration * rate)
+        values = rng.normal(0.0, 50.0, size=(n, ch_count)) + 800.0
+        for i in range(n):
+            times.append(i / rate)
+            dgrams.append(encode(address, values[i], fmt))
+            is_eeg.append(address == EEG_ADDRESS)
+    return _sorted(times, dgrams, is_eeg)
+
+
+def xdf_schedule(path, duration=None):
+    """Re-encode the Muse streams of an XDF recording (relay or OpenMuse names), keeping their original timing."""
+    import pyxdf  # Only needed for replay
+
+    by_name = {cfg[0]: [(address, slice(0, cfg[1]))] for address, cfg in STREAM_CONFIG.items()}
+    streams, _ = pyxdf.load_xdf(str(path))
+    t0 = min(s["time_stamps"][0] for s in streams if len(s["time_stamps"]))
+
+    times, dgrams, is_eeg = [], [], []
+    for stream in streams:
+        name = stream["info"]["name"][0]
+        targets = by_name.get(name) or OPENMUSE_STREAMS.get(name.split(" ")[0])
+        if not targets or not len(stream["time_stamps"]):
+            continue
+        for address, channels in targets:
+            fmt = STREAM_CONFIG[address][3]
+            for ts, values in zip(stream["time_stamps"], stream["time_series"]):
+                t = ts - t0
+                if duration is not None and t > duration:
+                    break
+                times.append(t)
+                dgrams.append(encode(address, list(values)[channels], fmt))
+                is_eeg.append(address == EEG_ADDRESS)
+    if not times:
+        raise ValueError(f"No Muse streams found in {path}")
+    return _sorted(times, dgrams, is_eeg)
+
+
+def _sorted(times, dgrams, is_eeg):
+    order = np.argsort(times, kind="stable")
+    return (np.asarray(times)[order], [bytearray(dgrams[i]) for i in order], np.asarray(is_eeg)[order])
+
+
+def send(schedule, speed, port, send_times):
+    """Send the schedule at `speed` x real time. EEG send times are stored by sequence number."""
+    times, dgrams, is_eeg = schedule
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    target = ("127.0.0.1", port)
+    seq = 0
+    start = local_clock()
+    for t, dgram, eeg in zip(times / speed, dgrams, is_eeg):
+        delay = start + t - local_clock()
+        if delay > 0.0005:
+            time.sleep(delay)
+        if eeg:
+            # Last float argument sits in the final 4 bytes of the datagram
+            struct.pack_into(">f", dgram, len(dgram) - 4, float(seq))
+            send_times[seq] = local_clock()
+            seq += 1
+        sock.sendto(dgram, target)
+    elapsed = local_clock() - start
+    sock.close()
+    return elapsed
+
+
+def collect(inlet, stop, received):
+    """Pull EEG from the relay, recording (sequence, LSL timestamp, pull time)."""
+    while not stop.is_set():
+        # pull_sample returns as soon as data is there; pull_chunk would wait out its timeout
+        sample, t = inlet.pull_sample(timeout=0.05)
+        if t is not None:
+            received.append((int(sample[-1]), t, local_clock()))
+
+
+def percentiles(values):
+    if len(values) == 0:
+        return {}
+    p = np.percentile(values, [50, 95, 99]) * 1000.0
+    return {"p50_ms": round(p[0], 3), "p95_ms": round(p[1], 3), "p99_ms": round(p[2], 3),
+            "max_ms": round(float(np.max(values)) * 1000.0, 3)}
+
+
+def run(schedule, speed, port):
+    relay = subprocess.Popen(
+        [sys.executable, str(RELAY_SCRIPT), "--bind", f"{port}:{BENCH_PARTICIPANT}"],
+        cwd=RELAY_SCRIPT.parent, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        found = resolve_byprop("name", f"muse_eeg_{BENCH_PARTICIPANT}", timeout=10.0)
+        if not found:
+            raise RuntimeError("Relay EEG stream did not appear")
+        inlet = StreamInlet(found[0], max_buflen=360)
+        inlet.open_stream(timeout=5.0)
+
+        n_eeg = int(schedule[2].sum())
+        send_times = np.full(n_eeg, np.nan)
+        received = []
+        stop = threading.Event()
+        collector = threading.Thread(target=collect, args=(inlet, stop, received), daemon=True)
+        collector.start()
+
+        wall = send(schedule, speed, port, send_times)
+        time.sleep(DRAIN_TIME)
+        stop.set()
+        collector.join()
+    finally:
+        relay.terminate()
+        relay.wait()
+
+    rec = np.asarray(received, dtype=np.float64).reshape(-1, 3)
+    seqs = rec[:, 0].astype(int)
+    valid = (seqs >= 0) & (seqs < n_eeg)
+    seqs, push_ts, pull_ts = seqs[valid], rec[valid, 1], rec[valid, 2]
+    unique = np.unique(seqs)
+
+    return {
+        "speed": speed,
+        "messages_sent": len(schedule[1]),
+        "wall_time_s": round(wall, 3),
+        "send_rate_msgs_s": round(len(schedule[1]) / wall, 1),
+        "eeg_sent": n_eeg,
+        "eeg_received": int(len(unique)),
+        "eeg_drop_pct": round((1.0 - len(unique) / n_eeg) * 100.0, 3) if n_eeg else None,
+        "eeg_reordered": int(np.sum(np.diff(seqs) < 0)),
+        "eeg_throughput_s": round(len(unique) / wall, 1),
+        "send_to_push": percentiles(push_ts - send_times[seqs]),
+        "send_to_inlet": percentiles(pull_ts - send_times[seqs]),
+    }
+
+
+def print_report(results):
+    print("\nspeed  sent/s    eeg drop%  reord  send->push p50/p99 ms   send->inlet p50/p99 ms")
+    for r in results:
+        push, inlet = r["send_to_push"], r["send_to_inlet"]
+        print(f"{r['speed']:>4}x  {r['send_rate_msgs_s']:>8}  {r['eeg_drop_pct']:>9}  {r['eeg_reordered']:>5}  "
+              f"{push.get('p50_ms', '-'):>9} / {push.get('p99_ms', '-'):<9}  "
+              f"{inlet.get('p50_ms', '-'):>9} / {inlet.get('p99_ms', '-')}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stress muse_osc.py with replayed OSC traffic")
+    parser.add_argument("--speed", type=float, nargs="+", default=[1.0, 10.0, 50.0],
+                        help="Replay speed(s), 1 = real time (max 50)")
+    parser.add_argument("--xdf", type=Path, help="Re-encode traffic from this XDF recording instead of synthetic data")
+    parser.add_argument("--duration", type=float, default=DURATION, help="Seconds of traffic per run (media time)")
+    parser.add_argument("--port", type=int, default=BENCH_PORT, help="UDP port for the relay under test")
+    parser.add_argument("--report", type=Path, help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    if any(s <= 0 or s > 50 for s in args.speed):
+        parser.error("--speed must be in (0, 50]")
+
+    schedule = xdf_schedule(args.xdf, args.duration) if args.xdf else synthetic_schedule(args.duration)
+    print(f"Traffic: {len(schedule[1])} messages over {schedule[0][-1]:.1f}s "
+          f"({'xdf: ' + str(args.xdf) if args.xdf else f'synthetic, seed {SEED}'})")
+
+    results = []
+    for speed in args.speed:
+        print(f"Running {speed}x ...", flush=True)
+        results.append(run(schedule, speed, args.port))
+    print_report(results)
+
+    if args.report:
+        report = {
+            "source": str(args.xdf) if args.xdf else f"synthetic(seed={SEED})",
+            "duration_s": args.duration,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results,
+        }
+        args.report.write_text(json.dumps(report, indent=2))
+        print(f"\nReport written to {args.report}")
\ No newline at end of file
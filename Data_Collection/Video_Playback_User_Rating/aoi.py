@@ -0,0 +1,176 @@
+"""
+Areas of interest (AOIs) on the video stimulus and online gaze-to-AOI mapping.
+
+An AOI file is JSON. Rectangles are [x0, y0, x1, y1] in normalized video
+coordinates (0-1, origin top left). Times are media seconds.
+
+    {
+      "segment_length": 60,
+      "segments": [{"name": "intro", "start": 0, "end": 45}],
+      "aois": [
+        {"name": "subtitles", "rect": [0.1, 0.85, 0.9, 1.0]},
+        {"name": "presenter", "regions": [
+            {"start": 0, "end": 30, "rect": [0.6, 0.2, 0.95, 0.9]},
+            {"start": 30, "end": 75.5, "rect": [0.05, 0.2, 0.4, 0.9]}
+        ]}
+      ]
+    }
+
+An AOI with "rect" is active for the whole video; "regions" key its
+rectangle to media time. Segments group dwell counts for the session
+summary; without "segments" the video is cut every "segment_length"
+seconds (default: the rating PAUSE_INTERVAL).
+
+For a playlist, "videos" maps video file names to their own definition
+(same keys as above); the top-level "aois", if any, apply to the videos
+not listed:
+
+    {"videos": {"clip_a.mp4": {"aois": [...]}, "clip_b.mp4": {"aois": [...], "segment_length": 30}}}
+"""
+import json
+import math
+
+# ── AOI CONFIGURATION ───────────────────────────────────
+GRID_SIZE = 16          # Spatial index cells per axis over the unit square
+DEFAULT_SEGMENT_S = 60  # Same as PAUSE_INTERVAL in play_video_lsl.py
+MAX_SAMPLE_GAP_S = 0.1  # Longest gap credited to dwell between two gaze samples
+# ────────────────────────────────────────────────────────
+
+
+class AoiSet:
+    """Declarative AOIs flattened to (aoi index, start, end, rect) regions with a uniform grid index."""
+
+    def __init__(self, aois, segments=None, segment_length=DEFAULT_SEGMENT_S):
+        self.names = []
+        self.regions = []  # (aoi index, start, end, x0, y0, x1, y1)
+        for aoi in aois:
+            index = len(self.names)
+            self.names.append(aoi["name"])
+            if "rect" in aoi:
+                spans = [{"start": 0.0, "end": math.inf, "rect": aoi["rect"]}]
+            else:
+                spans = aoi["regions"]
+            for span in spans:
+                x0, y0, x1, y1 = span["rect"]
+                if not (x0 < x1 and y0 < y1):
+                    raise ValueError(f"AOI '{aoi['name']}' has an empty rectangle {span['rect']}")
+                self.regions.append((index, float(span.get("start", 0.0)), float(span.get("end", math.inf)),
+                                     x0, y0, x1, y1))
+        if len(set(self.names)) != len(self.names):
+            raise ValueError("AOI names must be unique")
+
+        self.segments = [(s["name"], float(s["start"]), float(s["end"])) for s in segments or []]
+        self.segment_length = segment_length
+
+        # Each grid cell lists the regions overlapping it, so a lookup only tests those
+        self.grid = [[] for _ in range(GRID_SIZE * GRID_SIZE)]
+        for r, (_, _, _, x0, y0, x1, y1) in enumerate(self.regions):
+            for cy in range(self._cell(y0), self._cell(y1) + 1):
+                for cx in range(self._cell(x0), self._cell(x1) + 1):
+                    self.grid[cy * GRID_SIZE + cx].append(r)
+
+    @classmethod
+    def from_spec(cls, spec):
+        return cls(spec["aois"], spec.get("segments"), spec.get("segment_length", DEFAULT_SEGMENT_S))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls.from_spec(json.load(f))
+
+    @staticmethod
+    def _cell(v):
+        return min(GRID_SIZE - 1, max(0, int(v * GRID_SIZE)))
+
+    def hits(self, x, y, media_t):
+        """Indices of the AOIs containing (x, y) at media time media_t."""
+        if not (0.0 <= x <= 1.0 and 0.0 <= y <= 1.0):
+            return frozenset()
+        found = set()
+        for r in self.grid[self._cell(y) * GRID_SIZE + self._cell(x)]:
+            index, start, end, x0, y0, x1, y1 = self.regions[r]
+            if start <= media_t < end and x0 <= x <= x1 and y0 <= y <= y1:
+                found.add(index)
+        return frozenset(found)
+
+    def segment(self, media_t):
+        if not self.segments:
+            return f"{int(media_t // self.segment_length) * self.segment_length:g}s"
+        for name, start, end in self.segments:
+            if start <= media_t < end:
+                return name
+        return None
+
+
+def load_aoi_sets(path):
+    """AoiSet per video file name; key None holds the set for unlisted videos (if any)."""
+    with open(path, encoding="utf-8") as f:
+        spec = json.load(f)
+    sets = {name: AoiSet.from_spec(video_spec) for name, video_spec in spec.get("videos", {}).items()}
+    if "aois" in spec:
+        sets[None] = AoiSet.from_spec(spec)
+    if not sets:
+        raise ValueError(f"{path} defines no AOIs")
+    return sets
+
+
+class AoiTracker:
+    """
+    Feeds gaze samples through an AoiSet and keeps dwell counters.
+
+    update() returns enter/exit events for the AOIs whose membership changed.
+    Dwell time credits each sample with the time since the previous valid
+    sample (at most MAX_SAMPLE_GAP_S) for every AOI it hits, both in total
+    and per segment.
+    """
+
+    def __init__(self, aoi_set):
+        self.aois = aoi_set
+        self.inside = frozenset()
+        self.entered_at = {}
+        self.last_t = None
+        self.dwell = [0.0] * len(aoi_set.names)   # Total seconds per AOI
+        self.segment_dwell = {}                    # segment -> [seconds per AOI]
+        self.segment_samples = {}                  # segment -> valid gaze samples
+
+    def update(self, t, x, y, valid, media_t):
+        """One gaze sample at LSL time t; media_t is None while the video is not playing."""
+        events = []
+        hits = self.aois.hits(x, y, media_t) if valid and media_t is not None else frozenset()
+
+        if valid and media_t is not None:
+            dt = 0.0 if self.last_t is None else min(t - self.last_t, MAX_SAMPLE_GAP_S)
+            segment = self.aois.segment(media_t)
+            if segment is not None:
+                if segment not in self.segment_dwell:
+                    self.segment_dwell[segment] = [0.0] * len(self.dwell)
+                    self.segment_samples[segment] = 0
+                self.segment_samples[segment] += 1
+                for index in hits:
+                    self.segment_dwell[segment][index] += dt
+            for index in hits:
+                self.dwell[index] += dt
+            self.last_t = t
+        else:
+            self.last_t = None
+
+        if hits != self.inside:
+            names = self.aois.names
+            for index in self.inside - hits:
+                events.append({"event": "aoi_exit", "aoi": names[index], "media_t": media_t,
+                               "dwell_ms": (t - self.entered_at.pop(index)) * 1000.0})
+            for index in hits - self.inside:
+                self.entered_at[index] = t
+                events.append({"event": "aoi_enter", "aoi": names[index], "media_t": media_t})
+            self.inside = hits
+        return events
+
+    def summary(self):
+        """Dwell seconds per segment and AOI, with the number of valid gaze samples per segment."""
+        names = self.aois.names
+        out = {}
+        for segment, dwell in self.segment_dwell.items():
+            out[segment] = {"samples": self.segment_samples[segment],
+                            "dwell_s": {names[i]: round(d, 3) for i, d in enumerate(dwell)}}
+        out["total"] = {"dwell_s": {names[i]: round(d, 3) for i, d in enumerate(self.dwell)}}
+        return out
@@ -0,0 +1,196 @@
+"""
+Online gaze-in-AOI stream for the video stimulus.
+
+Reads the Beam gaze stream (any channel layout; gaze_conf_int, gaze_por_x,
+gaze_por_y in the unified 0-1 viewport) and the Video_Playback_Markers
+stream from play_video_lsl.py or session_scheduler.py, maps every gaze
+sample to media time and the video frame, and publishes:
+
+    AOI_Events   string markers, one JSON enter/exit event per AOI change
+    AOI_Dwell    cumulative dwell seconds per AOI in the current trial,
+                 once per DWELL_PUSH_S
+
+The trial and video channels of the markers select the AOI set (see
+"videos" in aoi.py) and restart dwell counting at every trial. Gaze only
+counts while the player is playing, so rating pauses add no dwell.
+
+When stopped (Ctrl+C) it prints dwell per trial and video segment and
+writes it to --summary.
+
+    python aoi_stream.py --aois aois/example.json --summary session_aoi.json
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+import pylsl
+
+from aoi import AoiTracker, load_aoi_sets
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+GAZE_STREAM_TYPE = "GazeHead"
+PLAYBACK_STREAM = "Video_Playback_Markers"
+VIDEO_SCREEN_RECT = (0.0, 0.0, 1.0, 1.0)  # Where the video is drawn, in normalized screen coordinates
+DWELL_PUSH_S = 1.0
+POLL_S = 0.01
+RESOLVE_TIMEOUT = 10.0
+
+
+class MediaClock:
+    """
+    Media time at any LSL time, from Video_Playback_Markers.
+
+    Every marker ([event, media_time_ms, playing, trial, video]) is an
+    anchor; while playing, media time advances with the LSL clock from the
+    latest one.
+    """
+
+    def __init__(self):
+        self.anchor_ms = None
+        self.anchor_t = None
+        self.playing = False
+        self.trial = None
+        self.video = None
+
+    def update(self, t, sample):
+        """Apply one marker; True when it belongs to a new trial."""
+        _, self.anchor_ms, playing, trial, video = sample[:5]
+        self.anchor_t = t
+        self.playing = bool(playing)
+        changed = (trial, video) != (self.trial, self.video)
+        self.trial, self.video = trial, video
+        return changed
+
+    def media_time(self, t):
+        if self.anchor_ms is None:
+            return None
+        if self.playing:
+            return (self.anchor_ms + max(t - self.anchor_t, 0.0) * 1000.0) / 1000.0
+        return self.anchor_ms / 1000.0
+
+
+def resolve_inlet(prop, value):
+    print(f"Waiting for LSL stream {prop}='{value}'...")
+    found = pylsl.resolve_byprop(prop, value, timeout=RESOLVE_TIMEOUT)
+    if not found:
+        raise RuntimeError(f"No LSL stream with {prop}='{value}'")
+    inlet = pylsl.StreamInlet(found[0], max_buflen=60, processing_flags=pylsl.proc_clocksync)
+    print(f"Found '{found[0].name()}' ({found[0].channel_count()} channels)")
+    return inlet
+
+
+def video_names(inlet):
+    """Video id -> file name, from the marker stream description."""
+    names = {}
+    video = inlet.info(RESOLVE_TIMEOUT).desc().child("videos").child("video")
+    while not video.empty():
+        names[int(video.child_value("id"))] = video.child_value("name")
+        video = video.next_sibling()
+    return names
+
+
+def setup_lsl(names):
+    info_events = pylsl.StreamInfo("AOI_Events", "Markers", 1, 0, 'string', "aoi_events_001")
+    info_events.desc().append_child_value("format", "json")
+    outlet_events = pylsl.StreamOutlet(info_events)
+
+    info_dwell = pylsl.StreamInfo("AOI_Dwell", "Dwell", len(names), 0, 'float32', "aoi_dwell_001")
+    channels = info_dwell.desc().append_child("channels")
+    for name in names:
+        ch = channels.append_child("channel")
+        ch.append_child_value("label", name)
+        ch.append_child_value("unit", "seconds")
+    outlet_dwell = pylsl.StreamOutlet(info_dwell)
+    return outlet_events, outlet_dwell
+
+
+def to_video(x, y):
+    x0, y0, x1, y1 = VIDEO_SCREEN_RECT
+    return (x - x0) / (x1 - x0), (y - y0) / (y1 - y0)
+
+
+def run(aoi_path, summary_path=None):
+    aoi_sets = load_aoi_sets(aoi_path)
+    names = list(dict.fromkeys(name for aois in aoi_sets.values() for name in aois.names))
+    outlet_events, outlet_dwell = setup_lsl(names)
+    for video, aois in aoi_sets.items():
+        print(f"Loaded {len(aois.names)} AOIs ({len(aois.regions)} regions) for {video or 'all other videos'}")
+
+    gaze_inlet = resolve_inlet("type", GAZE_STREAM_TYPE)
+    video_inlet = resolve_inlet("name", PLAYBACK_STREAM)
+    videos = video_names(video_inlet)
+
+    clock = MediaClock()
+    trials = {}       # trial -> (video name, AoiTracker or None when the video has no AOIs)
+    tracker = None
+    channels = []     # AOI_Dwell channel of each AOI of the current tracker
+    dwell = [0.0] * len(names)
+    pending = []      # Pulled markers not yet applied (applied in time order with the gaze)
+
+    def push_events(events, t):
+        for event in events:
+            outlet_events.push_sample([json.dumps(event, separators=(",", ":"))], t)
+
+    next_dwell_push = pylsl.local_clock() + DWELL_PUSH_S
+    last_gaze_t = None
+    try:
+        while True:
+            video, video_ts = video_inlet.pull_chunk(timeout=0.0)
+            pending.extend(zip(video_ts, video))
+
+            gaze, gaze_ts = gaze_inlet.pull_chunk(timeout=0.0)
+            for sample, t in zip(gaze, gaze_ts):
+                while pending and pending[0][0] <= t:
+                    marker_t, marker = pending.pop(0)
+                    if clock.update(marker_t, marker):
+                        if tracker is not None:  # Close the previous trial's open AOIs
+                            push_events(tracker.update(marker_t, 0.0, 0.0, False, None), marker_t)
+                        name = videos.get(clock.video, str(clock.video))
+                        aois = aoi_sets.get(name, aoi_sets.get(None))
+                        tracker = AoiTracker(aois) if aois is not None else None
+                        trials[clock.trial] = (name, tracker)
+                        channels = [names.index(n) for n in aois.names] if aois is not None else []
+                        dwell = [0.0] * len(names)
+                        print(f"[AOI] Trial {clock.trial}: {name}" + ("" if tracker else " (no AOIs)"))
+                if tracker is None:
+                    continue
+                x, y = to_video(sample[1], sample[2])
+                media_t = clock.media_time(t) if clock.playing else None
+                push_events(tracker.update(t, x, y, sample[0] != 0, media_t), t)
+                last_gaze_t = t
+
+            now = pylsl.local_clock()
+            if now >= next_dwell_push and last_gaze_t is not None and tracker is not None:
+                for channel, seconds in zip(channels, tracker.dwell):
+                    dwell[channel] = seconds
+                outlet_dwell.push_sample(dwell, last_gaze_t)
+                next_dwell_push = now + DWELL_PUSH_S
+            if not gaze and not video:
+                time.sleep(POLL_S)
+    except KeyboardInterrupt:
+        print("\nStopping AOI stream.")
+    finally:
+        summary = {}
+        for trial, (name, trial_tracker) in trials.items():
+            if trial_tracker is None:
+                continue
+            segments = trial_tracker.summary()
+            summary[f"trial{trial}"] = {"video": name, "segments": segments}
+            print(f"  Trial {trial} ({name})")
+            for segment, stats in segments.items():
+                dwell_text = ", ".join(f"{aoi} {s:.1f}s" for aoi, s in stats["dwell_s"].items())
+                print(f"  {segment:>10}: {dwell_text}")
+        if summary_path:
+            Path(summary_path).write_text(json.dumps(summary, indent=2))
+            print(f"AOI summary written to {summary_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish gaze-in-AOI events and dwell for the video stimulus")
+    parser.add_argument("--aois", required=True, help="AOI definition (JSON, see aoi.py)")
+    parser.add_argument("--summary", default=None, help="Write per-trial, per-segment dwell to this JSON file on exit")
+    args = parser.parse_args()
+    run(args.aois, args.summary)
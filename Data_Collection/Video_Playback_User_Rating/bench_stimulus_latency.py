@@ -0,0 +1,73 @@
+"""
+Pause/beep onset latency benchmark for the video experiment.
+
+Plays the stimulus video and runs N play -> pause + beep cycles the same
+way play_until_end() does at a rating stop, then prints the command ->
+onset distribution for both stimuli. The Stimulus_Timing stream carries
+every request/onset pair, so a photodiode or microphone recorded in the
+same XDF can check the reported onsets.
+
+    python bench_stimulus_latency.py --n 50 --beep memory
+    python bench_stimulus_latency.py --n 50 --beep vlc --video videos/sample1080p.mp4
+"""
+import argparse
+import time
+from pathlib import Path
+
+import vlc
+
+from play_video_lsl import BEEP_PATH, VIDEO_PATH
+from stimulus_timing import StimulusTiming
+from vlc_markers import PLAYING, PlaybackMarkers, setup_marker_outlet
+
+# ── BENCHMARK CONFIGURATION ─────────────────────────────
+PLAY_S = 0.5       # Playback between two pauses
+PAUSED_S = 0.5     # Hold each pause (lets the beep finish)
+START_TIMEOUT = 5.0
+# ────────────────────────────────────────────────────────
+
+
+def main(n, beep, video=VIDEO_PATH):
+    if not video.exists():
+        print(f"CRITICAL ERROR: Video file missing at {video}")
+        return
+
+    vlc_instance = vlc.Instance("--input-repeat=0")
+    player = vlc_instance.media_player_new()
+    player.set_media(vlc_instance.media_new(str(video)))
+    markers = PlaybackMarkers(player, setup_marker_outlet([video.name]))
+    stimuli = StimulusTiming(vlc_instance, BEEP_PATH, use_memory_beep=beep == "memory")
+    print(f"Beep path: {stimuli.beep_path_kind}  ({n} cycles)")
+
+    try:
+        for i in range(n):
+            markers.clear(PLAYING)
+            if i:
+                player.set_pause(0)
+            else:
+                player.play()
+            if markers.wait_for(PLAYING, START_TIMEOUT) is None:
+                print("[WARNING] VLC did not report Playing; stopping")
+                break
+            time.sleep(PLAY_S)
+
+            request_t = stimuli.pause(player, markers)
+            stimuli.beep()
+            stimuli.confirm_pause(markers, request_t)
+            time.sleep(PAUSED_S)
+    except KeyboardInterrupt:
+        print("\nBenchmark stopped.")
+    finally:
+        player.stop()
+        stimuli.close()
+        stimuli.report()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure pause and beep command -> onset latency")
+    parser.add_argument("--n", type=int, default=20, help="Pause/beep cycles")
+    parser.add_argument("--beep", choices=("memory", "vlc"), default="memory",
+                        help="memory: in-memory sounddevice beep, vlc: beep on a VLC media player")
+    parser.add_argument("--video", type=Path, default=VIDEO_PATH, help="Video to pause (default: the stimulus)")
+    args = parser.parse_args()
+    main(args.n, args.beep, args.video)
@@ -1,9 +1,14 @@
 import vlc
 import time
 import sys
+import argparse
+import statistics
+import threading
 from pathlib import Path
-from pylsl import StreamInfo, StreamOutlet
+from pylsl import StreamInfo, StreamOutlet, local_clock
 from pynput import keyboard
+from vlc_markers import HEARTBEAT_S, PlaybackMarkers, setup_marker_outlet
+from stimulus_timing import StimulusTiming
 
 # ==========================================
 # CONFIGURATION
@@ -13,33 +18,58 @@ BEEP_PATH = Path(__file__).parent / "audio" / "beep.mp3"
 
 PAUSE_INTERVAL = 60  # Seconds
 
+PAUSE_RATING = "pause"            # Video stops every PAUSE_INTERVAL, rate 1-5 to resume
+CONTINUOUS_RATING = "continuous"  # Rate any time while the video plays (1-5, Up/Down)
+RATING_MODE = PAUSE_RATING
+RATING_KEYS = ('1', '2', '3', '4', '5')
+RATING_MIN, RATING_MAX = 1, 5
+SHOW_RATING_OVERLAY = True        # Continuous mode: draw the current rating on the video
+
 # ==========================================
 # GLOBAL STATE
 # ==========================================
 current_rating = 0       
 waiting_for_input = False 
-input_received = False   
+input_received = threading.Event()  # Set by the key listener, unblocks the main loop
 player = None            # Will hold the VLC player instance
+rating_mode = RATING_MODE
+outlet_rating_cont = None  # Engagement_Rating_Continuous (continuous mode only)
+prompt_time = None         # LSL time of the last rating prompt (pause mode)
+rating_latencies = {PAUSE_RATING: [], CONTINUOUS_RATING: []}  # ms: prompt -> keypress / keypress -> overlay set
 
 # ==========================================
 # HELPER FUNCTIONS
 # ==========================================
 def on_press(key):
-    global current_rating, waiting_for_input, input_received, player
-    
-    # 1. HANDLE ENGAGEMENT INPUT (Blocking Mode)
+    global current_rating, waiting_for_input, player
+    t_key = local_clock()  # Keypress time, taken in the listener thread before anything else
+    char = getattr(key, 'char', None)
+
+    # 1. HANDLE CONTINUOUS RATING (Video keeps playing)
+    if rating_mode == CONTINUOUS_RATING:
+        new_val = None
+        if char in RATING_KEYS:
+            new_val = int(char)
+        elif key == keyboard.Key.up:
+            new_val = min(RATING_MAX, max(current_rating, RATING_MIN - 1) + 1)
+        elif key == keyboard.Key.down:
+            new_val = max(RATING_MIN, current_rating - 1)
+        if new_val is not None:
+            set_continuous_rating(new_val, t_key)
+            return
+
+    # 2. HANDLE ENGAGEMENT INPUT (Blocking Mode)
     if waiting_for_input:
-        try:
-            if hasattr(key, 'char') and key.char in '12345':
-                new_val = int(key.char)
-                current_rating = new_val
-                print(f"\n[INPUT] User Rated: {new_val}")
-                input_received = True # Unlocks the main loop
-        except AttributeError:
-            pass
+        if char in RATING_KEYS:
+            new_val = int(char)
+            current_rating = new_val
+            reaction_ms = (t_key - prompt_time) * 1000.0
+            rating_latencies[PAUSE_RATING].append(reaction_ms)
+            print(f"\n[INPUT] User Rated: {new_val} ({reaction_ms:.0f} ms after the prompt)")
+            input_received.set() # Unlocks the main loop
         return # Ignore other keys (like space) while waiting for rating
 
-    # 2. HANDLE SPACEBAR (Normal Mode)
+    # 3. HANDLE SPACEBAR (Normal Mode)
     if key == keyboard.Key.space:
         if player.is_playing():
             player.pause()
@@ -48,6 +78,47 @@ def on_press(key):
             player.play()
             print("[USER] Playing")
 
+def set_continuous_rating(value, t_key):
+    """Push a rating change stamped with the keypress time; logs keypress-to-overlay latency."""
+    global current_rating
+    if value == current_rating:
+        return
+    current_rating = value
+    outlet_rating_cont.push_sample([value], t_key)
+    if not SHOW_RATING_OVERLAY:
+        print(f"[RATING] {value}")
+        return
+    bar = "#" * value + "-" * (RATING_MAX - value)
+    show_text(f"Engagement {value}/{RATING_MAX} [{bar}]")
+    latency_ms = (local_clock() - t_key) * 1000.0  # Push + marquee update, as the participant's feedback
+    rating_latencies[CONTINUOUS_RATING].append(latency_ms)
+    print(f"[RATING] {value} (keypress -> overlay {latency_ms:.2f} ms)")
+
+def reset_rating():
+    """New trial: the rating starts unset instead of carrying the previous trial's value."""
+    global current_rating
+    current_rating = 0
+
+def setup_rating_overlay():
+    show_text(f"Engagement -/{RATING_MAX}")
+
+def show_text(text):
+    """Draw text on the video (VLC marquee filter), bottom right; "" clears it."""
+    player.video_set_marquee_int(vlc.VideoMarqueeOption.Enable, 1)
+    player.video_set_marquee_int(vlc.VideoMarqueeOption.Position, 10)  # Bottom right
+    player.video_set_marquee_int(vlc.VideoMarqueeOption.Size, 32)
+    player.video_set_marquee_string(vlc.VideoMarqueeOption.Text, text)
+
+def report_rating_latency():
+    labels = {PAUSE_RATING: "prompt -> keypress", CONTINUOUS_RATING: "keypress -> overlay set"}
+    for mode, latencies in rating_latencies.items():
+        if not latencies:
+            continue
+        ordered = sorted(latencies)
+        p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+        print(f"[LATENCY] {labels[mode]}: n={len(ordered)}  median {statistics.median(ordered):.2f} ms  "
+              f"p95 {p95:.2f} ms  max {ordered[-1]:.2f} ms")
+
 def setup_lsl():
     info_time = StreamInfo('Video_Time_Data', 'Time_Markers', 1, 0, 'int32', 'vid_time_stream_001')
     outlet_time = StreamOutlet(info_time)
@@ -57,18 +128,111 @@ def setup_lsl():
     
     return outlet_time, outlet_eng
 
+def push_time_and_rating(outlet_time, outlet_eng, seconds, last):
+    """Push Video_Time_Data/Engagement_Rating only on a change, or once per HEARTBEAT_S."""
+    now = local_clock()
+    values = (seconds, current_rating)
+    if last is None or values != last[0] or now - last[1] >= HEARTBEAT_S:
+        outlet_time.push_sample([seconds], now)
+        outlet_eng.push_sample([current_rating], now)
+        return values, now
+    return last
+
+def setup_continuous_outlet():
+    """Irregular stream with one sample per rating change, stamped at keypress time."""
+    global outlet_rating_cont
+    info_cont = StreamInfo('Engagement_Rating_Continuous', 'Rating', 1, 0, 'int32', 'vid_rating_cont_001')
+    outlet_rating_cont = StreamOutlet(info_cont)
+
+def pause_due(seconds, pause_interval, pause_times):
+    """Rating stop at this media second: explicit pause_times if given, else every pause_interval."""
+    if seconds <= 0:
+        return False
+    if pause_times is not None:
+        return seconds in pause_times
+    return seconds % pause_interval == 0
+
+def play_until_end(markers, stimuli, outlet_time, outlet_eng,
+                   pause_interval=PAUSE_INTERVAL, pause_times=None, prompt=None):
+    """
+    Run the rating loop for the video on the global `player` until it ends.
+    Rating stops (pause mode) happen at pause_times (media seconds) or every
+    pause_interval; prompt is shown on the video while waiting for a rating.
+    """
+    global waiting_for_input, prompt_time
+
+    last_trigger_second = 0
+    last_sent = None  # ((seconds, rating), LSL time) of the last Video_Time_Data/Engagement_Rating push
+
+    while True:
+        # Check for end of video
+        if player.get_state() == vlc.State.Ended:
+            print("Video Ended.")
+            break
+
+        # Get current time (extrapolated from VLC's last time report)
+        t_ms = markers.media_time()
+        if t_ms < 0: t_ms = 0
+        seconds = int(t_ms // 1000)
+
+        # --- CHECK TRIGGER CONDITION (Only if playing) ---
+        if (rating_mode == PAUSE_RATING and player.is_playing() and seconds != last_trigger_second
+                and pause_due(seconds, pause_interval, pause_times)):
+
+            print(f"\n[TRIGGER] Rating stop at {seconds}s. Pausing...")
+
+            # A. Force Pause
+            pause_request_t = stimuli.pause(player, markers)
+
+            # B. Play Beep (request/onset times go to Stimulus_Timing)
+            stimuli.beep()
+            stimuli.confirm_pause(markers, pause_request_t)
+            if prompt:
+                print(f"[PROMPT] {prompt}")
+                show_text(prompt)
+
+            # C. Block until input
+            prompt_time = local_clock()
+            input_received.clear()
+            waiting_for_input = True
+            last_trigger_second = seconds
+
+            # Wait for the key listener, waking only for the heartbeats
+            while not input_received.wait(HEARTBEAT_S):
+                last_sent = push_time_and_rating(outlet_time, outlet_eng, seconds, last_sent)
+                markers.heartbeat()
+
+            # D. Resume
+            print("[RESUME] Input received. Resuming...")
+            waiting_for_input = False
+            if prompt:
+                show_text("")
+            player.set_pause(0)
+
+        # --- LSL PUSH (on change + heartbeat) ---
+        last_sent = push_time_and_rating(outlet_time, outlet_eng, seconds, last_sent)
+        markers.heartbeat()
+
+        time.sleep(0.033)
+
 # ==========================================
 # MAIN EXECUTION
 # ==========================================
-def main():
-    global waiting_for_input, input_received, current_rating, player
+def main(mode=RATING_MODE):
+    global player, rating_mode
+    rating_mode = mode
 
     print("--- STARTING EXPERIMENT ---")
     print("Press SPACE to start/pause video.")
-    print("When video pauses automatically, press 1-5 to rate.")
+    if rating_mode == CONTINUOUS_RATING:
+        print("Rate engagement any time with 1-5 or Up/Down; the video keeps playing.")
+    else:
+        print("When video pauses automatically, press 1-5 to rate.")
 
     # 1. Setup LSL
     outlet_time, outlet_eng = setup_lsl()
+    if rating_mode == CONTINUOUS_RATING:
+        setup_continuous_outlet()
 
     # 2. Setup VLC
     if not VIDEO_PATH.exists():
@@ -79,12 +243,12 @@ def main():
     player = vlc_instance.media_player_new()
     media = vlc_instance.media_new(str(VIDEO_PATH))
     player.set_media(media)
+
+    # Millisecond playback markers from VLC events (Video_Playback_Markers)
+    markers = PlaybackMarkers(player, setup_marker_outlet([VIDEO_PATH.name]))
     
-    # 3. Setup Audio
-    sfx_player = vlc_instance.media_player_new()
-    if BEEP_PATH.exists():
-        sfx_media = vlc_instance.media_new(str(BEEP_PATH))
-        sfx_player.set_media(sfx_media)
+    # 3. Setup Audio (beep decoded into memory when sounddevice is available)
+    stimuli = StimulusTiming(vlc_instance, BEEP_PATH)
 
     # 4. Start Keyboard Listener
     listener = keyboard.Listener(on_press=on_press)
@@ -95,63 +259,23 @@ def main():
     time.sleep(0.5) 
     player.set_pause(1) # Immediately pause so user sees first frame
     player.set_fullscreen(True)
-    
-    last_trigger_second = 0
+    if rating_mode == CONTINUOUS_RATING and SHOW_RATING_OVERLAY:
+        setup_rating_overlay()
 
     try:
-        while True:
-            # Check for end of video
-            if player.get_state() == vlc.State.Ended:
-                print("Video Ended.")
-                break
-
-            # Get current time
-            t_ms = player.get_time()
-            if t_ms < 0: t_ms = 0
-            seconds = int(t_ms // 1000)
-
-            # --- CHECK TRIGGER CONDITION (Only if playing) ---
-            if player.is_playing() and seconds > 0 and seconds % PAUSE_INTERVAL == 0 and seconds != last_trigger_second:
-                
-                print(f"\n[TRIGGER] 60s Interval Reached at {seconds}s. Pausing...")
-                
-                # A. Force Pause
-                player.set_pause(1)
-                
-                # B. Play Beep
-                if BEEP_PATH.exists():
-                    sfx_player.stop()
-                    sfx_player.play()
-                
-                # C. Block until input
-                waiting_for_input = True
-                input_received = False
-                last_trigger_second = seconds 
-
-                # Wait Loop
-                while not input_received:
-                    # Keep streaming LSL even while waiting
-                    outlet_time.push_sample([seconds])
-                    outlet_eng.push_sample([current_rating])
-                    time.sleep(0.05) 
-
-                # D. Resume
-                print("[RESUME] Input received. Resuming...")
-                waiting_for_input = False
-                player.set_pause(0)
-
-            # --- STANDARD LSL PUSH ---
-            outlet_time.push_sample([seconds])
-            outlet_eng.push_sample([current_rating])
-
-            time.sleep(0.033)
-
+        play_until_end(markers, stimuli, outlet_time, outlet_eng)
     except KeyboardInterrupt:
         print("\nExperiment manually stopped.")
     finally:
         player.stop()
-        sfx_player.release()
+        stimuli.close()
         listener.stop()
+        report_rating_latency()
+        stimuli.report()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Play the stimulus video and stream engagement ratings to LSL")
+    parser.add_argument("--mode", choices=(PAUSE_RATING, CONTINUOUS_RATING), default=RATING_MODE,
+                        help="pause: rate at every PAUSE_INTERVAL stop, continuous: rate while playing")
+    args = parser.parse_args()
+    main(args.mode)
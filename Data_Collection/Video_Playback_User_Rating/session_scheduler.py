@@ -0,0 +1,214 @@
+"""
+Multi-stimulus session for play_video_lsl.py, driven by a playlist manifest.
+
+One VLC instance and two media players for the whole session: while a
+trial plays on one player, the next trial's Media is created, parsed and
+set on the other, so switching videos needs no instance start-up or
+parse. Block and trial boundaries go to the Session_Markers stream as JSON
+markers stamped with the VLC Playing/EndReached event times. Both players
+share Video_Playback_Markers: every marker carries the trial index and
+video id, and the idle player is muted before it is stopped.
+
+Manifest (JSON, video paths relative to the manifest):
+
+    {
+      "defaults": {"rating_mode": "pause", "pause_interval": 60,
+                   "prompt": "How engaged are you? Press 1-5"},
+      "blocks": [
+        {"name": "practice", "trials": [
+            {"video": "videos/sample1080p.mp4", "pauses": [20]}
+        ]},
+        {"name": "main", "trials": [
+            {"video": "videos/Kurzgezagt_Quantum_Computers.mp4"},
+            {"video": "videos/sample1080p.mp4", "rating_mode": "continuous"}
+        ]}
+      ]
+    }
+
+Per trial: "rating_mode" (pause/continuous), "pause_interval" (s) or
+explicit "pauses" (media seconds), and "prompt" shown at rating stops.
+
+    python session_scheduler.py playlists/example_session.json
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+import vlc
+from pylsl import StreamInfo, StreamOutlet, local_clock
+from pynput import keyboard
+
+import play_video_lsl as pv
+from stimulus_timing import StimulusTiming
+from vlc_markers import ENDED, PLAYING, PlaybackMarkers, setup_marker_outlet
+
+# ==========================================
+# SESSION CONFIGURATION
+# ==========================================
+START_TIMEOUT = 5.0   # Seconds to wait for VLC to report Playing after play()
+FIRST_FRAME_SETTLE_S = 0.1  # After the video output appears, before pausing on the first frame
+FIRST_FRAME_FALLBACK_S = 0.5  # Fixed wait when VLC reports no video output (as play_video_lsl.py)
+PARSE_TIMEOUT_MS = 5000
+TRIAL_DEFAULTS = {"rating_mode": pv.PAUSE_RATING, "pause_interval": pv.PAUSE_INTERVAL,
+                  "pauses": None, "prompt": None}
+
+
+def load_manifest(path):
+    """Flatten the manifest into a list of trials with defaults and absolute video paths."""
+    path = Path(path)
+    spec = json.loads(path.read_text(encoding="utf-8"))
+    defaults = {**TRIAL_DEFAULTS, **spec.get("defaults", {})}
+    trials = []
+    for b, block in enumerate(spec["blocks"]):
+        for t, trial in enumerate(block["trials"]):
+            trial = {**defaults, **trial}
+            video = (path.parent / trial["video"]).resolve()
+            if not video.exists():
+                raise FileNotFoundError(f"Block '{block.get('name', b)}' trial {t}: video missing at {video}")
+            if trial["rating_mode"] not in (pv.PAUSE_RATING, pv.CONTINUOUS_RATING):
+                raise ValueError(f"Unknown rating_mode '{trial['rating_mode']}'")
+            trial.update(video=video, block=block.get("name", f"block{b + 1}"), block_index=b, trial_index=t)
+            if trial["pauses"] is not None:
+                trial["pauses"] = set(int(s) for s in trial["pauses"])
+            trials.append(trial)
+    return trials
+
+
+def setup_session_outlet():
+    info = StreamInfo('Session_Markers', 'Markers', 1, 0, 'string', 'vid_session_markers_001')
+    info.desc().append_child_value("format", "json")
+    return StreamOutlet(info)
+
+
+def push_marker(outlet, t, event, **fields):
+    outlet.push_sample([json.dumps({"event": event, **fields}, separators=(",", ":"))], t)
+    print(f"[SESSION] {event} {fields}")
+
+
+def trial_fields(trial):
+    return {"block": trial["block"], "trial": trial["trial_index"], "video": trial["video"].name}
+
+
+def video_ids(trials):
+    """Video id per trial (index into the distinct videos, in playlist order) and the video names."""
+    paths = list(dict.fromkeys(trial["video"] for trial in trials))
+    return [paths.index(trial["video"]) for trial in trials], [path.name for path in paths]
+
+
+def preload(vlc_instance, player, markers, trial):
+    """Create and parse the trial's Media and set it on the idle player."""
+    media = vlc_instance.media_new(str(trial["video"]))
+    media.parse_with_options(vlc.MediaParseFlag.local, PARSE_TIMEOUT_MS)
+    player.set_media(media)
+    markers.reset()
+    return media
+
+
+def run_session(manifest_path):
+    trials = load_manifest(manifest_path)
+    print(f"--- STARTING SESSION: {len(trials)} trials ---")
+    print("Press SPACE to start the first video.")
+
+    # 1. Setup LSL
+    outlet_time, outlet_eng = pv.setup_lsl()
+    if any(trial["rating_mode"] == pv.CONTINUOUS_RATING for trial in trials):
+        pv.setup_continuous_outlet()
+    session_outlet = setup_session_outlet()
+    trial_videos, video_names = video_ids(trials)
+    marker_outlet = setup_marker_outlet(video_names)
+
+    # 2. Setup VLC: one instance, two players that take turns
+    vlc_instance = vlc.Instance("--input-repeat=0")
+    players = [vlc_instance.media_player_new(), vlc_instance.media_player_new()]
+    markers = [PlaybackMarkers(player, marker_outlet, active=False) for player in players]
+    stimuli = StimulusTiming(vlc_instance, pv.BEEP_PATH)
+
+    # 3. Keyboard listener acts on whichever player is current (pv.player)
+    listener = keyboard.Listener(on_press=pv.on_press)
+    listener.start()
+
+    current = 0
+    preload(vlc_instance, players[0], markers[0], trials[0])
+    pv.player = players[0]
+    markers[0].start_trial(0, trial_videos[0])
+
+    # 4. First video: show its first frame, start on SPACE
+    players[0].play()
+    markers[0].wait_for(PLAYING, START_TIMEOUT)
+    if markers[0].wait_for_video(START_TIMEOUT):
+        time.sleep(FIRST_FRAME_SETTLE_S)
+    else:
+        print("[WARNING] VLC reported no video output; pausing after a fixed wait")
+        time.sleep(FIRST_FRAME_FALLBACK_S)
+    players[0].set_pause(1)
+    players[0].set_fullscreen(True)
+    markers[0].clear(PLAYING)
+    markers[0].clear(ENDED)
+
+    push_marker(session_outlet, local_clock(), "session_start", trials=len(trials))
+    block = None
+    try:
+        for i, trial in enumerate(trials):
+            player, trial_markers = players[current], markers[current]
+            if trial["block"] != block:
+                if block is not None:
+                    push_marker(session_outlet, local_clock(), "block_end", block=block)
+                block = trial["block"]
+                push_marker(session_outlet, local_clock(), "block_start", block=block)
+
+            pv.rating_mode = trial["rating_mode"]
+            pv.reset_rating()
+            if pv.rating_mode == pv.CONTINUOUS_RATING and pv.SHOW_RATING_OVERLAY:
+                pv.setup_rating_overlay()
+
+            if i > 0:
+                trial_markers.start_trial(i, trial_videos[i])
+                player.play()
+            t_start = None
+            while t_start is None:  # First trial: waits for SPACE
+                t_start = trial_markers.wait_for(PLAYING, START_TIMEOUT if i > 0 else 1.0)
+                if t_start is None and i > 0:
+                    t_start = local_clock()
+                    print("[WARNING] VLC did not report Playing; trial start stamped now")
+            if i > 0:
+                player.set_fullscreen(True)
+                previous = players[1 - current]
+                markers[1 - current].mute()  # Its Stopped event must not reach the shared marker stream
+                previous.stop()  # After the new window is up, so the desktop never shows
+            push_marker(session_outlet, t_start, "trial_start", **trial_fields(trial))
+
+            # Preload the next trial on the idle player while this one plays
+            if i + 1 < len(trials):
+                other = 1 - current
+                preload(vlc_instance, players[other], markers[other], trials[i + 1])
+                markers[other].clear(PLAYING)
+                markers[other].clear(ENDED)  # Before its play(), so an early end is never lost
+
+            pv.play_until_end(trial_markers, stimuli, outlet_time, outlet_eng,
+                              trial["pause_interval"], trial["pauses"], trial["prompt"])
+            t_end = trial_markers.wait_for(ENDED, 0.0) or local_clock()
+            push_marker(session_outlet, t_end, "trial_end", **trial_fields(trial))
+
+            if i + 1 < len(trials):
+                current = 1 - current
+                pv.player = players[current]
+        push_marker(session_outlet, local_clock(), "block_end", block=block)
+        push_marker(session_outlet, local_clock(), "session_end")
+    except KeyboardInterrupt:
+        print("\nSession manually stopped.")
+        push_marker(session_outlet, local_clock(), "session_stopped")
+    finally:
+        for player in players:
+            player.stop()
+        stimuli.close()
+        listener.stop()
+        pv.report_rating_latency()
+        stimuli.report()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a playlist of stimulus videos with ratings and LSL markers")
+    parser.add_argument("manifest", help="Playlist manifest (JSON, see module docstring)")
+    args = parser.parse_args()
+    run_session(args.manifest)
@@ -0,0 +1,217 @@
+"""
+Pause and beep onset timing for the video experiment.
+
+Every stimulus command is recorded twice on the Stimulus_Timing marker
+stream: "<kind>_request" at the LSL time the command was issued and
+"<kind>_onset" at the LSL time it was confirmed, with the latency between
+them.
+
+    pause  request: before player.set_pause(1)
+           onset:   VLC MediaPlayerPaused event
+    beep   request: before the beep player's play()
+           onset:   in-memory beep (sounddevice): DAC time of the buffer
+                    holding the first beep sample, from the PortAudio callback;
+                    VLC fallback: the sfx player's MediaPlayerPlaying event
+
+Onsets are reported on other threads (VLC events, audio worker) and can
+arrive before or after a later request, so a rating stop's markers are
+collected and pushed from the calling thread in timestamp order once
+confirm_pause() has both onsets (or timed out).
+"""
+import json
+import queue
+import statistics
+import threading
+
+import vlc
+from pylsl import StreamInfo, StreamOutlet, local_clock
+
+try:
+    import sounddevice
+    import soundfile
+except (ImportError, OSError):  # OSError: PortAudio/libsndfile missing
+    sounddevice = soundfile = None
+
+from vlc_markers import PAUSED
+
+# ==========================================
+# STIMULUS TIMING CONFIGURATION
+# ==========================================
+PAUSE_CONFIRM_TIMEOUT = 1.0  # Seconds to wait for VLC's Paused event
+BEEP_CONFIRM_TIMEOUT = 1.0   # Seconds to wait for the beep onset
+AUDIO_LATENCY = "low"        # PortAudio latency hint for the beep stream
+
+
+class MemoryBeep:
+    """
+    Beep decoded once into memory and mixed into an always-open output stream.
+
+    play() only arms the next audio callback, so no file is opened or
+    decoded at trigger time. The callback that writes the first beep
+    sample reports its DAC time (converted to the LSL clock) as the onset.
+    """
+
+    def __init__(self, path, on_onset):
+        data, self.samplerate = soundfile.read(str(path), dtype="float32", always_2d=True)
+        self.data = data
+        self.on_onset = on_onset        # Called as on_onset(request_t, onset_t) from a worker thread
+        self.position = None            # Next beep frame to write; None while silent
+        self.pending = None             # Request time of an armed, not yet started beep
+        self.onsets = queue.SimpleQueue()
+        self.stream = sounddevice.OutputStream(samplerate=self.samplerate, channels=data.shape[1],
+                                               dtype="float32", latency=AUDIO_LATENCY, callback=self._callback)
+        try:
+            self.stream.start()
+        except Exception:
+            self.stream.close()
+            raise
+        threading.Thread(target=self._report_onsets, daemon=True).start()
+
+    def play(self, request_t):
+        self.pending = request_t
+
+    def _callback(self, outdata, frames, time_info, status):
+        outdata.fill(0.0)
+        request_t = self.pending
+        if request_t is not None:
+            self.pending = None
+            self.position = 0
+            # Stream time -> LSL time via the current time of this callback
+            dac_delay = time_info.outputBufferDacTime - time_info.currentTime
+            if dac_delay <= 0.0:  # Some host APIs report no DAC time
+                dac_delay = self.stream.latency
+            self.onsets.put((request_t, local_clock() + dac_delay))
+        if self.position is not None:
+            chunk = self.data[self.position:self.position + frames]
+            outdata[:len(chunk)] = chunk
+            self.position += len(chunk)
+            if self.position >= len(self.data):
+                self.position = None
+
+    def _report_onsets(self):
+        # LSL pushes stay out of the audio callback
+        while True:
+            request_t, onset_t = self.onsets.get()
+            self.on_onset(request_t, onset_t)
+
+    def close(self):
+        self.stream.stop()
+        self.stream.close()
+
+
+class VlcBeep:
+    """Fallback: beep on a VLC media player; onset is the player's Playing event."""
+
+    def __init__(self, vlc_instance, path, on_onset):
+        self.player = vlc_instance.media_player_new()
+        self.player.set_media(vlc_instance.media_new(str(path)))
+        self.on_onset = on_onset
+        self.request_t = None
+        self.player.event_manager().event_attach(vlc.EventType.MediaPlayerPlaying, self._on_playing)
+
+    def play(self, request_t):
+        self.request_t = request_t  # Playing may fire before play() returns
+        self.player.stop()
+        self.player.play()
+
+    def _on_playing(self, event):
+        onset_t = local_clock()
+        if self.request_t is not None:
+            self.on_onset(self.request_t, onset_t)
+            self.request_t = None
+
+    def close(self):
+        self.player.release()
+
+
+class StimulusTiming:
+    """Issues pauses and beeps and records request/onset markers and latencies."""
+
+    def __init__(self, vlc_instance, beep_path, use_memory_beep=True):
+        info = StreamInfo('Stimulus_Timing', 'Markers', 1, 0, 'string', 'vid_stimulus_timing_001')
+        info.desc().append_child_value("format", "json")
+        self.outlet = StreamOutlet(info)
+        self.latencies = {"pause": [], "beep": []}  # ms, command -> confirmed onset
+        self.pending = []                # (t, kind, phase, fields) of the current stop, not yet pushed
+        self.beep_onsets = queue.SimpleQueue()  # (request_t, onset_t) from the beep player's thread
+        self.beep_outstanding = False
+
+        self.beep_player = None
+        if beep_path.exists():
+            if use_memory_beep and sounddevice is not None:
+                try:
+                    self.beep_player = MemoryBeep(beep_path, self._beep_onset)
+                except Exception as e:  # Undecodable file, no output device, stream open failure
+                    print(f"[WARNING] In-memory beep unavailable ({e}); using the VLC beep")
+            if self.beep_player is None:
+                self.beep_player = VlcBeep(vlc_instance, beep_path, self._beep_onset)
+        self.beep_path_kind = type(self.beep_player).__name__ if self.beep_player else "none"
+
+    def _record(self, kind, phase, t, **fields):
+        self.pending.append((t, kind, phase, fields))
+
+    def _flush(self):
+        """Push the collected markers, oldest first (the outlet needs monotonic timestamps)."""
+        for t, kind, phase, fields in sorted(self.pending, key=lambda m: m[0]):
+            self.outlet.push_sample([json.dumps({"event": f"{kind}_{phase}", **fields}, separators=(",", ":"))], t)
+        self.pending = []
+
+    def _onset(self, kind, request_t, onset_t):
+        latency_ms = (onset_t - request_t) * 1000.0
+        self.latencies[kind].append(latency_ms)
+        self._record(kind, "onset", onset_t, request_t=request_t, latency_ms=round(latency_ms, 3))
+
+    def _beep_onset(self, request_t, onset_t):
+        # Beep player thread: hand over to the thread that pushes
+        self.beep_onsets.put((request_t, onset_t))
+
+    def pause(self, player, markers):
+        """Request a pause; pass the returned request time to confirm_pause()."""
+        markers.clear(PAUSED)
+        request_t = local_clock()
+        self._record("pause", "request", request_t)
+        player.set_pause(1)
+        return request_t
+
+    def confirm_pause(self, markers, request_t):
+        """
+        Wait for VLC's Paused event (PAUSE_CONFIRM_TIMEOUT at most) and an
+        outstanding beep onset (BEEP_CONFIRM_TIMEOUT), then push the stop's
+        markers.
+        """
+        onset_t = markers.wait_for(PAUSED, PAUSE_CONFIRM_TIMEOUT)
+        if onset_t is None:
+            print("[WARNING] VLC did not confirm the pause")
+        else:
+            self._onset("pause", request_t, onset_t)
+        if self.beep_outstanding:
+            try:
+                self._onset("beep", *self.beep_onsets.get(timeout=BEEP_CONFIRM_TIMEOUT))
+            except queue.Empty:
+                print("[WARNING] Beep onset not reported")
+            self.beep_outstanding = False
+        self._flush()
+
+    def beep(self):
+        if self.beep_player is None:
+            return
+        while not self.beep_onsets.empty():  # Late onset of a beep that timed out
+            self.beep_onsets.get_nowait()
+        request_t = local_clock()
+        self._record("beep", "request", request_t, path=self.beep_path_kind)
+        self.beep_outstanding = True
+        self.beep_player.play(request_t)
+
+    def report(self):
+        for kind, latencies in self.latencies.items():
+            if not latencies:
+                continue
+            ordered = sorted(latencies)
+            p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+            print(f"[LATENCY] {kind} command -> onset: n={len(ordered)}  median {statistics.median(ordered):.2f} ms  "
+                  f"p95 {p95:.2f} ms  max {ordered[-1]:.2f} ms")
+
+    def close(self):
+        self._flush()
+        if self.beep_player is not None:
+            self.beep_player.close()
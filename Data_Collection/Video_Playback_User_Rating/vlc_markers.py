@@ -0,0 +1,162 @@
+import threading
+
+import vlc
+from pylsl import StreamInfo, StreamOutlet, local_clock
+
+# ==========================================
+# PLAYBACK MARKER CONFIGURATION
+# ==========================================
+MARKER_STREAM = "Video_Playback_Markers"
+HEARTBEAT_S = 1.0         # Current media time/state is re-sent this often
+SEEK_TOLERANCE_MS = 750   # Media time jump beyond this (vs. the wall clock) is a seek
+
+# Event codes (channel 0)
+PLAYING = 1
+PAUSED = 2
+SEEKED = 3
+ENDED = 4
+STOPPED = 5
+HEARTBEAT = 6
+EVENT_NAMES = {PLAYING: "playing", PAUSED: "paused", SEEKED: "seeked", ENDED: "ended",
+               STOPPED: "stopped", HEARTBEAT: "heartbeat"}
+CH_NAMES = ["event", "media_time_ms", "playing", "trial", "video"]
+
+
+def setup_marker_outlet(videos=()):
+    """
+    Irregular int32 markers: [event code, media time (ms), playing flag,
+    trial index, video id]. Video ids index `videos` (file names), listed
+    in the stream description.
+    """
+    info = StreamInfo(MARKER_STREAM, 'Markers', len(CH_NAMES), 0, 'int32', 'vid_playback_markers_001')
+    channels = info.desc().append_child("channels")
+    for name in CH_NAMES:
+        channels.append_child("channel").append_child_value("label", name)
+    events = info.desc().append_child("events")
+    for code, name in EVENT_NAMES.items():
+        events.append_child_value(name, str(code))
+    video_list = info.desc().append_child("videos")
+    for video_id, name in enumerate(videos):
+        video = video_list.append_child("video")
+        video.append_child_value("id", str(video_id))
+        video.append_child_value("name", str(name))
+    return StreamOutlet(info)
+
+
+class PlaybackMarkers:
+    """
+    Pushes playback markers from VLC media-player events instead of polling.
+
+    VLC reports media time in MediaPlayerTimeChanged; each report becomes
+    the anchor (media ms, LSL time) that media_time() extrapolates from while
+    playing. Markers are pushed only for state changes (playing, paused,
+    ended, stopped), for seeks (a reported time that disagrees with the
+    anchor by more than SEEK_TOLERANCE_MS), and as a heartbeat. Callbacks
+    run on VLC's event thread and never call back into libvlc.
+
+    Every marker carries the trial index and video id set by start_trial().
+    A muted instance (an idle player sharing the outlet) ignores its
+    player's events, so stopping that player pushes nothing.
+    """
+
+    def __init__(self, player, outlet, trial=0, video=0, active=True):
+        self.outlet = outlet
+        self.lock = threading.Lock()
+        self.trial = trial
+        self.video = video
+        self.active = active
+        self.playing = False
+        self.anchor_ms = 0
+        self.anchor_t = local_clock()
+        self.last_push = 0.0
+        self.event_times = {}  # Event code -> LSL time of its last occurrence
+        self.event_flags = {code: threading.Event() for code in (PLAYING, PAUSED, ENDED, STOPPED)}
+        self.video_out = threading.Event()  # Set once the media's video output exists (first frame up)
+
+        events = player.event_manager()
+        events.event_attach(vlc.EventType.MediaPlayerTimeChanged, self._on_time_changed)
+        events.event_attach(vlc.EventType.MediaPlayerPlaying, self._on_state, PLAYING)
+        events.event_attach(vlc.EventType.MediaPlayerPaused, self._on_state, PAUSED)
+        events.event_attach(vlc.EventType.MediaPlayerEndReached, self._on_state, ENDED)
+        events.event_attach(vlc.EventType.MediaPlayerStopped, self._on_state, STOPPED)
+        events.event_attach(vlc.EventType.MediaPlayerVout, self._on_vout)
+
+    def start_trial(self, trial, video):
+        """Unmute and tag all following markers with this trial index and video id."""
+        with self.lock:
+            self.trial, self.video = trial, video
+            self.active = True
+
+    def mute(self):
+        """Ignore this player's events from now on (until start_trial)."""
+        with self.lock:
+            self.active = False
+
+    def reset(self):
+        """New media on the player: media time restarts at 0, paused."""
+        with self.lock:
+            self.playing = False
+            self.anchor_ms = 0
+            self.anchor_t = local_clock()
+        self.video_out.clear()
+
+    def media_time(self, t=None):
+        """Media time in ms at LSL time t (default: now)."""
+        with self.lock:
+            return self._media_time(local_clock() if t is None else t)
+
+    def _media_time(self, t):
+        if self.playing:
+            return self.anchor_ms + int((t - self.anchor_t) * 1000.0)
+        return self.anchor_ms
+
+    def _push(self, code, t):
+        self.outlet.push_sample([code, self._media_time(t), int(self.playing), self.trial, self.video], t)
+        self.last_push = t
+
+    def _on_time_changed(self, event):
+        t = local_clock()
+        new_ms = event.u.new_time
+        with self.lock:
+            if not self.active:
+                return
+            seeked = abs(new_ms - self._media_time(t)) > SEEK_TOLERANCE_MS
+            self.anchor_ms, self.anchor_t = new_ms, t
+            if seeked:
+                self._push(SEEKED, t)
+
+    def _on_state(self, event, code):
+        t = local_clock()
+        with self.lock:
+            if not self.active:
+                return
+            self.anchor_ms = self._media_time(t)  # Freeze/restart the extrapolation here
+            self.anchor_t = t
+            self.playing = code == PLAYING
+            self._push(code, t)
+            self.event_times[code] = t
+        self.event_flags[code].set()
+
+    def wait_for(self, code, timeout):
+        """Block until the state event `code` fires after the last clear(code); returns its LSL time or None."""
+        if self.event_flags[code].wait(timeout):
+            return self.event_times[code]
+        return None
+
+    def clear(self, code):
+        self.event_flags[code].clear()
+
+    def _on_vout(self, event):
+        if event.u.new_count > 0:
+            self.video_out.set()
+
+    def wait_for_video(self, timeout):
+        """Block until the video output exists (at most timeout s); False on timeout."""
+        return self.video_out.wait(timeout)
+
+    def heartbeat(self):
+        """Call from the main loop; pushes the current state once per HEARTBEAT_S."""
+        t = local_clock()
+        with self.lock:
+            if self.active and t - self.last_push >= HEARTBEAT_S:
+                self._push(HEARTBEAT, t)
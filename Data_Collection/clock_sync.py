@@ -0,0 +1,108 @@
+"""
+Device clock -> LSL clock mapping, shared by the device scripts.
+
+Every sample gives one observation d = arrival - sender = offset + drift * t + delay,
+where delay >= 0 is transport/scheduling delay (TCP and app buffering for
+the MSBand phone, listener scheduling for the Beam SDK). Taking the
+minimum of d per block keeps the observations closest to zero delay; a
+least squares line through the last history_blocks minima gives offset
+and drift, so delay jitter does not leak into the sample times.
+
+Device folders import it from Data_Collection/:
+
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+    from clock_sync import ClockMapper
+"""
+from collections import deque
+
+import numpy as np
+
+# --- CLOCK SYNC CONFIGURATION ---
+BLOCK_SEC = 5.0       # Minimum-delay point is taken once per block of sender time
+HISTORY_BLOCKS = 60   # Blocks kept for the offset/drift fit (5 min)
+
+
+class ClockMapper:
+    """
+    Maps sender timestamps onto the LSL clock (see module docstring).
+
+    add() every observation; when a block closes the fit is refreshed,
+    `updated` is set and the delay statistics of that block (delay above
+    the fitted line: mean, std, max, count) are available for diagnostics.
+    """
+
+    def __init__(self, block_s=BLOCK_SEC, history_blocks=HISTORY_BLOCKS):
+        self.block_s = block_s
+        self.minima = deque(maxlen=history_blocks)
+        self.block_end = None
+        self.block_min = None       # (sender_t, d) with smallest d in the current block
+        self.block_count = 0
+        self.block_delay_sum = 0.0  # Delay above the fitted line, accumulated over the block
+        self.block_delay_sq = 0.0
+        self.block_delay_max = 0.0
+
+        self.t_ref = None           # Sender time the fit is centered on
+        self.offset = None          # LSL - sender at t_ref (s)
+        self.drift = 0.0            # d(offset)/dt (s/s)
+        self.mean_delay = 0.0       # Delay above the fit in the last closed block (s)
+        self.delay_std = 0.0
+        self.max_delay = 0.0
+        self.delay_count = 0
+        self.updated = False        # Set when a block closes and the fit changes
+
+    def add(self, sender_t, arrival_t):
+        d = arrival_t - sender_t
+        if self.block_end is None:
+            self.block_end = sender_t + self.block_s
+            self.t_ref = sender_t
+
+        if sender_t >= self.block_end:
+            self._close_block()
+            self.block_end = sender_t + self.block_s
+
+        if self.block_min is None or d < self.block_min[1]:
+            self.block_min = (sender_t, d)
+        if not self.minima:
+            # No fit yet: follow the running minimum
+            self.offset = self.block_min[1]
+        delay = d - self._line(sender_t)
+        self.block_count += 1
+        self.block_delay_sum += delay
+        self.block_delay_sq += delay * delay
+        if delay > self.block_delay_max:
+            self.block_delay_max = delay
+
+    def _close_block(self):
+        if self.block_min is None:
+            return
+        self.minima.append(self.block_min)
+        n = max(1, self.block_count)
+        self.mean_delay = self.block_delay_sum / n
+        self.delay_std = float(np.sqrt(max(0.0, self.block_delay_sq / n - self.mean_delay ** 2)))
+        self.max_delay = self.block_delay_max
+        self.delay_count = self.block_count
+        self.block_min = None
+        self.block_count = 0
+        self.block_delay_sum = self.block_delay_sq = self.block_delay_max = 0.0
+
+        t = np.array([m[0] for m in self.minima]) - self.t_ref
+        d = np.array([m[1] for m in self.minima])
+        if len(t) >= 2 and np.ptp(t) > 0:
+            self.drift, self.offset = (float(v) for v in np.polyfit(t, d, 1))
+        else:
+            self.drift, self.offset = 0.0, float(d.min())
+        self.updated = True
+
+    def _line(self, sender_t):
+        return self.offset + self.drift * (sender_t - self.t_ref)
+
+    def map(self, sender_t, arrival_t=None):
+        """LSL time of a sender timestamp (scalar or array); never later than arrival_t."""
+        lsl_t = sender_t + self._line(sender_t)
+        if arrival_t is not None:
+            lsl_t = np.minimum(lsl_t, arrival_t)
+        return lsl_t
+
+    def map_one(self, sender_t, arrival_t):
+        """Scalar map() on Python floats, for per-sample callbacks."""
+        return min(sender_t + self._line(sender_t), arrival_t)
@@ -1,97 +1,35 @@
-import time
+import argparse
 import tkinter as tk
 from tkinter import ttk
-from collections import deque
-from pylsl import ContinuousResolver, StreamInlet
+import numpy as np
+from lsl_monitor import StreamMonitor, add_record_args, make_recorder, stream_status
 
 # ==========================================
 # SETTINGS
 # ==========================================
-WINDOW_DURATION = 10.0   # Window size for "Effective Hz" (Current calculating speed)
 REFRESH_RATE_MS = 100    # How often the GUI updates (10fps)
+PREVIEW_HEIGHT = 240     # Signal preview pane (pixels)
+PREVIEW_MAX_CHANNELS = 8 # Lanes drawn for the selected stream
 
-class StreamContainer:
-    """Holds data and logic for a single LSL stream."""
-    def __init__(self, info):
-        self.info = info
-        self.name = info.name()
-        self.type = info.type()
-        self.source_id = info.source_id()
-        self.nominal_srate = info.nominal_srate()
-        self.channel_count = info.channel_count()
-        
-        # Unique ID for the GUI table
-        self.uid = self.source_id if self.source_id else f"{self.name}_{self.type}"
-        
-        self.inlet = StreamInlet(info)
-        
-        # --- Metrics ---
-        self.timestamps = deque()       # For sliding window calc
-        self.start_time = None          # Time of first sample received
-        self.total_samples = 0          # Total samples since connection
-        
-        self.effective_rate = 0.0       # Last 10s
-        self.running_rate = 0.0         # Since start
-
-    def process(self):
-        """Pulls data and updates rate calculations."""
-        try:
-            # Non-blocking pull of all available data
-            _, ts = self.inlet.pull_chunk(timeout=0.0)
-            
-            if ts:
-                # Initialize start time if this is the first chunk
-                if self.start_time is None:
-                    self.start_time = ts[0]
-
-                # Update Counters
-                count = len(ts)
-                self.total_samples += count
-                self.timestamps.extend(ts)
-                
-                # --- Calc 1: Running Average (Since start) ---
-                # Total Samples / (Latest Timestamp - First Timestamp)
-                total_duration = ts[-1] - self.start_time
-                if total_duration > 1.0: # Avoid noise in first second
-                    self.running_rate = self.total_samples / total_duration
-
-            # --- Calc 2: Effective Rate (Sliding Window) ---
-            # Prune old timestamps
-            if self.timestamps:
-                latest = self.timestamps[-1]
-                limit = latest - WINDOW_DURATION
-                while self.timestamps and self.timestamps[0] < limit:
-                    self.timestamps.popleft()
-
-                # Calculate based on what remains in the deque
-                if len(self.timestamps) > 1:
-                    window_duration = self.timestamps[-1] - self.timestamps[0]
-                    if window_duration > 0:
-                        self.effective_rate = len(self.timestamps) / window_duration
-                else:
-                    self.effective_rate = 0.0
-            else:
-                self.effective_rate = 0.0
-
-        except Exception:
-            self.effective_rate = 0.0
+def fmt(value, scale, spec):
+    """Scaled number for a table cell, '-' while it is unknown."""
+    return "-" if value is None else format(value * scale, spec)
 
 class LSLMonitorGUI:
-    def __init__(self, root):
+    def __init__(self, root, recorder=None):
         self.root = root
-        self.root.title("LSL Stream Monitor")
-        self.root.geometry("950x450")
+        self.root.title("LSL Stream Monitor" + (f" - recording {recorder.path}" if recorder else ""))
+        self.root.geometry("1500x700")
 
-        # 1. Background Resolver (Continuously looks for streams)
-        self.resolver = ContinuousResolver()
-        self.streams = {} # Map uid -> StreamContainer
+        # 1. Background Resolver + inlet pulling (off the Tk thread)
+        self.monitor = StreamMonitor(recorder=recorder)
 
         # 2. GUI Setup
         self.setup_ui()
 
         # 3. Start Loops
         self.running = True
-        self.update_streams_loop()
+        self.monitor.start()
         self.update_gui_loop()
 
     def setup_ui(self):
@@ -102,7 +40,8 @@ class LSLMonitorGUI:
         style.configure("Treeview.Heading", font=('Segoe UI', 10, 'bold'))
 
         # Define Columns
-        columns = ("name", "type", "chans", "nominal", "effective", "running", "status")
+        columns = ("name", "type", "chans", "nominal", "effective", "running",
+                   "offset", "drift", "interval", "latency", "chunk", "status")
         self.tree = ttk.Treeview(self.root, columns=columns, show="headings")
         
         # Configure Headers
@@ -112,6 +51,11 @@ class LSLMonitorGUI:
         self.tree.heading("nominal", text="Nominal Hz")
         self.tree.heading("effective", text="Effective Hz (10s)")
         self.tree.heading("running", text="Running Avg Hz")
+        self.tree.heading("offset", text="Offset ms")
+        self.tree.heading("drift", text="Drift ppm")
+        self.tree.heading("interval", text="Chunk Gap p50/p99 ms")
+        self.tree.heading("latency", text="Latency ms")
+        self.tree.heading("chunk", text="Chunk p50/max")
         self.tree.heading("status", text="Status")
 
         # Configure Columns
@@ -121,13 +65,24 @@ class LSLMonitorGUI:
         self.tree.column("nominal", width=100, anchor="center")
         self.tree.column("effective", width=130, anchor="center")
         self.tree.column("running", width=130, anchor="center")
+        self.tree.column("offset", width=90, anchor="center")
+        self.tree.column("drift", width=90, anchor="center")
+        self.tree.column("interval", width=150, anchor="center")
+        self.tree.column("latency", width=90, anchor="center")
+        self.tree.column("chunk", width=110, anchor="center")
         self.tree.column("status", width=150, anchor="center")
 
         # Scrollbar
         scrollbar = ttk.Scrollbar(self.root, orient=tk.VERTICAL, command=self.tree.yview)
         self.tree.configure(yscroll=scrollbar.set)
+
+        # Signal preview of the selected row (min/max envelope per channel)
+        self.preview = tk.Canvas(self.root, height=PREVIEW_HEIGHT, background="#ffffff", highlightthickness=0)
+        self.preview_drawn = None
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
         
         # Layout
+        self.preview.pack(side=tk.BOTTOM, fill=tk.X)
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
@@ -136,55 +91,31 @@ class LSLMonitorGUI:
         self.tree.tag_configure("warn", background="#fffacd")   # Yellowish
         self.tree.tag_configure("error", background="#ffe6e6")  # Reddish
 
-    def update_streams_loop(self):
-        """Checks for new streams every 500ms."""
-        if not self.running: return
-
-        results = self.resolver.results()
-        
-        for info in results:
-            uid = info.source_id() if info.source_id() else f"{info.name()}_{info.type()}"
-
-            # Register new stream
-            if uid not in self.streams:
-                container = StreamContainer(info)
-                self.streams[uid] = container
-                # Insert empty row
-                self.tree.insert("", "end", iid=uid, values=(
-                    container.name, container.type, container.channel_count, 
-                    container.nominal_srate, "0.0", "0.0", "Init..."
-                ))
-        
-        # Process data logic
-        for container in self.streams.values():
-            container.process()
-
-        self.root.after(50, self.update_streams_loop)
-
     def update_gui_loop(self):
         """Refreshes the GUI table values."""
         if not self.running: return
 
-        for uid, s in self.streams.items():
+        snapshot = self.monitor.snapshot
+        listed = {s.uid for s in snapshot}
+        for uid in self.tree.get_children():
+            if uid not in listed:
+                self.tree.delete(uid)  # Forgotten by the monitor
+
+        for s in snapshot:
+            uid = s.uid
+            if not self.tree.exists(uid):
+                self.tree.insert("", "end", iid=uid)
             # Status Logic
-            status_text = "OK"
-            tag = "ok"
-            
-            # Calculate deviation based on "Effective" (Current) rate
-            diff = 0
-            if s.nominal_srate > 0:
-                diff = abs(s.effective_rate - s.nominal_srate) / s.nominal_srate
-
-            if s.effective_rate == 0:
-                status_text = "NO DATA"
-                tag = "error"
-            elif diff > 0.15: # >15% deviation
-                status_text = "UNSTABLE"
-                tag = "warn"
+            status_text, tag = stream_status(s)
             
             # Format numbers
             eff_str = f"{s.effective_rate:.1f}"
             run_str = f"{s.running_rate:.2f}"
+            offset_str = fmt(s.clock_offset, 1000.0, ".2f")
+            drift_str = fmt(s.clock_drift, 1.0, ".1f")
+            interval_str = f"{fmt(s.interval_p50, 1000.0, '.0f')} / {fmt(s.interval_p99, 1000.0, '.0f')}"
+            latency_str = fmt(s.latency, 1000.0, ".1f")
+            chunk_str = f"{fmt(s.chunk_p50, 1.0, '.0f')} / {fmt(s.chunk_max, 1.0, '.0f')}"
             
             # Update Treeview Row
             try:
@@ -195,19 +126,90 @@ class LSLMonitorGUI:
                     s.nominal_srate, 
                     eff_str,
                     run_str,
+                    offset_str,
+                    drift_str,
+                    interval_str,
+                    latency_str,
+                    chunk_str,
                     status_text
                 ), tags=(tag,))
             except tk.TclError:
-                pass # Row might have been deleted (not implemented here but good safety)
+                pass # Tree torn down mid-refresh (window closing); rows themselves are only removed above
 
+        try:
+            self.draw_preview()
+        except Exception as e:  # A bad preview must not stop the refresh loop
+            print(f"[WARNING] Signal preview failed: {e}")
         self.root.after(REFRESH_RATE_MS, self.update_gui_loop)
 
+    def on_select(self, event):
+        selected = self.tree.selection()
+        self.monitor.preview_uid = selected[0] if selected else None
+
+    def draw_preview(self):
+        """
+        Draw the monitor's latest decimated envelope (already min/max per
+        pixel column). Non-finite columns (all-NaN bins) are left as gaps.
+        """
+        width = self.preview.winfo_width()
+        if width > 1:
+            self.monitor.preview_width = width
+        p = self.monitor.preview
+        if p is self.preview_drawn:
+            return
+        self.preview_drawn = p
+        self.preview.delete("all")
+        if p is None:
+            self.preview.create_text(10, 10, anchor="nw", fill="#888888",
+                                     text="Select a numeric stream to preview its signal")
+            return
+
+        height = self.preview.winfo_height()
+        channels = min(len(p.mins), PREVIEW_MAX_CHANNELS)
+        lane = height / channels
+        columns = p.mins.shape[1]
+        xs = np.arange(columns) * (width / columns)
+        span = f"{p.seconds:.1f} s" if p.seconds is not None else f"{p.samples} samples"
+        self.preview.create_text(width - 10, 4, anchor="ne", fill="#888888",
+                                 text=f"{p.name}  ({span}, {len(p.mins)} ch)")
+        for c in range(channels):
+            valid = np.isfinite(p.mins[c]) & np.isfinite(p.maxs[c])
+            if not valid.any():
+                self.preview.create_text(4, c * lane + 2, anchor="nw", fill="#555555",
+                                         text=f"ch{c + 1}  no data")
+                continue
+            mins = np.where(valid, p.mins[c], np.nan)
+            maxs = np.where(valid, p.maxs[c], np.nan)
+            lo, hi = float(np.nanmin(mins)), float(np.nanmax(maxs))
+            mins[~valid] = maxs[~valid] = lo  # Gap columns: not drawn, keep the arithmetic finite
+            scale = (lane * 0.8) / (hi - lo) if hi > lo else 0.0
+            mid = (c + 0.5) * lane
+            y_hi = mid + (lane * 0.4 if scale else 0.0) - (maxs - lo) * scale
+            y_lo = mid + (lane * 0.4 if scale else 0.0) - (mins - lo) * scale
+            coords = np.empty((columns, 4))
+            coords[:, 0] = xs
+            coords[:, 1] = y_hi
+            coords[:, 2] = xs
+            coords[:, 3] = y_lo
+            # One polyline per run of drawable columns
+            breaks = np.flatnonzero(np.diff(valid)) + 1
+            for run in np.split(np.arange(columns), breaks):
+                if valid[run[0]]:
+                    self.preview.create_line(*coords[run].ravel().tolist(), fill="#1f5fa8")
+            self.preview.create_text(4, c * lane + 2, anchor="nw", fill="#555555",
+                                     text=f"ch{c + 1}  p-p {hi - lo:.3g}")
+
     def on_close(self):
         self.running = False
+        self.monitor.stop()
         self.root.destroy()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LSL stream monitor (Tk window)")
+    add_record_args(parser)
+    args = parser.parse_args()
+
     root = tk.Tk()
-    app = LSLMonitorGUI(root)
+    app = LSLMonitorGUI(root, make_recorder(args))
     root.protocol("WM_DELETE_WINDOW", app.on_close)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,698 @@
+"""
+LSL stream monitor core and headless mode.
+
+StreamMonitor resolves every LSL stream on the network and tracks its
+sample rates on background threads; lsl.py draws it in a Tk window. This
+module never imports tkinter, so on a headless acquisition machine it can
+run next to the collectors:
+
+    python lsl_monitor.py --port 9108 --log monitor.jsonl
+    python lsl_monitor.py --record session.xdf --split-minutes 30
+
+Every LOG_INTERVAL seconds one JSON line with all streams goes to --log
+(stdout without it), plus one line per stream transition (found, lost,
+reattached, restarted, forgotten), and http://127.0.0.1:<port>/metrics serves the
+current metrics in Prometheus text format. With --record every monitored
+stream is also written to XDF from the same inlets (see xdf_recorder.py).
+"""
+import argparse
+import bisect
+import json
+import sys
+import time
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pylsl
+from pylsl import ContinuousResolver, StreamInlet, local_clock
+from xdf_recorder import XdfRecorder
+
+# ==========================================
+# SETTINGS
+# ==========================================
+WINDOW_DURATION = 10.0   # Window size for "Effective Hz" (Current calculating speed)
+MIN_WINDOW_CAPACITY = 1024  # Initial timestamp slots per stream (grows for fast streams)
+PULL_INTERVAL = 0.05     # Seconds between inlet pulls (background thread)
+RESOLVE_INTERVAL = 0.5   # Seconds between checks for new streams
+PULL_WORKERS = 4         # Threads pulling inlets in parallel
+PULL_MAX_SAMPLES = 1024  # Samples per pull_chunk call (pulls repeat until drained)
+UNSTABLE_DEVIATION = 0.15  # Effective vs nominal rate deviation flagged as UNSTABLE
+CLOCK_INTERVAL = 5.0     # Seconds between inlet.time_correction() readings
+CLOCK_TIMEOUT = 0.05     # Wait for the first time_correction() estimate (retried next cycle)
+LOST_TIMEOUT = 5.0       # Seconds a stream may be missing from the resolver (with no data) before it is lost
+FORGET_AFTER = 300.0     # Seconds a lost stream stays listed before it is dropped
+RECORD_INFO_TIMEOUT = 2.0  # Wait for the full stream info (with desc) when recording starts a stream
+PREVIEW_SECONDS = 10.0   # Signal history kept per numeric stream for the preview
+PREVIEW_MAX_SAMPLES = 8192   # Cap on that history (fast or irregular streams)
+PREVIEW_INTERVAL = 0.1   # Seconds between decimations of the selected stream (10 fps)
+PREVIEW_WIDTH = 800      # Columns to decimate to until the GUI reports its width
+
+# Headless mode
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+LOG_INTERVAL = 5.0       # Seconds between JSON log lines
+
+# Numeric formats are pulled into a reused buffer; sample values are never converted to Python
+FORMAT_DTYPES = {
+    pylsl.cf_float32: np.float32, pylsl.cf_double64: np.float64, pylsl.cf_int8: np.int8,
+    pylsl.cf_int16: np.int16, pylsl.cf_int32: np.int32, pylsl.cf_int64: np.int64,
+}
+
+# Immutable per-stream metrics, published by StreamMonitor
+# (last_received: local_clock() of the last pull that returned samples, None before the first;
+#  timing fields are None until enough data has arrived)
+StreamSnapshot = namedtuple("StreamSnapshot", [
+    "uid", "name", "type", "channel_count", "nominal_srate", "effective_rate", "running_rate",
+    "last_received",
+    "state",          # ACTIVE or LOST
+    "state_since",    # local_clock() of the last state change
+    "clock_offset",   # inlet.time_correction(), seconds
+    "clock_drift",    # Slope of the offset over local time, ppm
+    "interval_p50",   # Seconds between the newest timestamps of consecutive chunks
+    "interval_p99",
+    "latency",        # local_clock() minus the newest timestamp (offset-corrected) at its pull
+    "chunk_p50",      # Samples per pulled chunk
+    "chunk_max",
+])
+# Min/max envelope of the selected stream: mins/maxs are (channels, columns) float32 arrays
+PreviewSnapshot = namedtuple("PreviewSnapshot", ["uid", "name", "mins", "maxs", "samples", "seconds"])
+
+STATUSES = ("OK", "UNSTABLE", "NO DATA", "LOST")
+ACTIVE = "ACTIVE"
+LOST = "LOST"
+
+def stream_uid(info):
+    """Monitor key of a stream: its source_id, or name_type without one."""
+    return info.source_id() if info.source_id() else f"{info.name()}_{info.type()}"
+
+def stream_status(s):
+    """Status text and row tag from the stream state and effective rate."""
+    if s.state == LOST:
+        return "LOST", "error"
+
+    # Calculate deviation based on "Effective" (Current) rate
+    diff = 0
+    if s.nominal_srate > 0:
+        diff = abs(s.effective_rate - s.nominal_srate) / s.nominal_srate
+
+    if s.effective_rate == 0:
+        return "NO DATA", "error"
+    if diff > UNSTABLE_DEVIATION:
+        return "UNSTABLE", "warn"
+    return "OK", "ok"
+
+def last_sample_age(s, now=None):
+    """Seconds since samples last arrived for this stream, or None if none have."""
+    if s.last_received is None:
+        return None
+    return (local_clock() if now is None else now) - s.last_received
+
+class P2Quantile:
+    """
+    Streaming quantile estimate with the P-square algorithm (Jain & Chlamtac, 1985).
+
+    Five markers track the minimum, p/2, p, (1+p)/2 and the maximum; each
+    new value moves them by one parabolic (or linear) step, so memory and
+    cost per value are constant however long the session runs.
+    """
+    def __init__(self, p):
+        self.p = p
+        self.q = []                                            # Marker heights (first 5 values, sorted)
+        self.n = [0, 1, 2, 3, 4]                               # Marker positions
+        self.want = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]        # Desired positions
+        self.step = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def add(self, x):
+        q, n = self.q, self.n
+        if len(q) < 5:
+            bisect.insort(q, x)
+            return
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = bisect.bisect_right(q, x) - 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.want[i] += self.step[i]
+
+        for i in (1, 2, 3):
+            d = self.want[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                qp = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if not q[i - 1] < qp < q[i + 1]:
+                    qp = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = qp
+                n[i] += d
+
+    def value(self):
+        if not self.q:
+            return None
+        if len(self.q) < 5:
+            return self.q[int(round(self.p * (len(self.q) - 1)))]
+        return self.q[2]
+
+    def max(self):
+        return self.q[-1] if self.q else None
+
+class ClockDrift:
+    """Least-squares slope of clock offset over local time from running sums (constant memory)."""
+    def __init__(self):
+        self.t0 = None
+        self.n = 0
+        self.st = self.so = self.stt = self.sto = 0.0
+
+    def add(self, t, offset):
+        if self.t0 is None:
+            self.t0 = t
+        t -= self.t0  # Keep the sums small
+        self.n += 1
+        self.st += t
+        self.so += offset
+        self.stt += t * t
+        self.sto += t * offset
+
+    def slope(self):
+        """Seconds of offset change per second, or None with fewer than 2 readings."""
+        denom = self.n * self.stt - self.st * self.st
+        if self.n < 2 or denom <= 0:
+            return None
+        return (self.n * self.sto - self.st * self.so) / denom
+
+class PreviewBuffer:
+    """Ring of the latest samples of a numeric stream, decimated to min/max per pixel column."""
+    def __init__(self, capacity, channels):
+        self.data = np.zeros((capacity, channels), dtype=np.float32)
+        self.pos = 0     # Next row to write
+        self.count = 0   # Valid rows
+
+    def extend(self, chunk):
+        capacity = len(self.data)
+        n = len(chunk)
+        if n >= capacity:
+            self.data[:] = chunk[-capacity:]
+            self.pos, self.count = 0, capacity
+            return
+        first = min(n, capacity - self.pos)
+        self.data[self.pos:self.pos + first] = chunk[:first]
+        self.data[:n - first] = chunk[first:]
+        self.pos = (self.pos + n) % capacity
+        self.count = min(capacity, self.count + n)
+
+    def latest(self):
+        """Valid rows, oldest first."""
+        if self.count < len(self.data):
+            return self.data[:self.count]
+        return np.concatenate((self.data[self.pos:], self.data[:self.pos]))
+
+    def decimate(self, width):
+        """
+        (mins, maxs) per channel over `width` equal column bins; one column
+        per sample if fewer. NaN samples are skipped (fmin/fmax), so only an
+        all-NaN bin is NaN.
+        """
+        x = self.latest()
+        if len(x) == 0:
+            return None
+        if len(x) <= width:
+            return x.T.copy(), x.T.copy()
+        edges = (np.arange(width) * len(x)) // width
+        return np.fmin.reduceat(x, edges, axis=0).T, np.fmax.reduceat(x, edges, axis=0).T
+
+class TimestampWindow:
+    """
+    Timestamps of the last `duration` seconds in a preallocated float64 array.
+
+    New chunks are copied to the end of the live span [start, end); the
+    window edge is found with searchsorted instead of popping samples one by
+    one. When the array fills up the live span is moved to the front, or the
+    array doubles if the span takes more than half of it.
+    """
+    def __init__(self, duration, capacity=MIN_WINDOW_CAPACITY):
+        self.duration = duration
+        self.buf = np.empty(capacity)
+        self.start = 0
+        self.end = 0
+
+    def __len__(self):
+        return self.end - self.start
+
+    def extend(self, ts):
+        n = len(ts)
+        if self.end + n > len(self.buf):
+            live = self.buf[self.start:self.end]
+            if len(live) + n > len(self.buf) // 2:
+                buf = np.empty(max(2 * len(self.buf), 2 * (len(live) + n)))
+            else:
+                buf = self.buf
+            buf[:len(live)] = live  # Overlapping copy is safe: live starts after the front
+            self.buf, self.start, self.end = buf, 0, len(live)
+        self.buf[self.end:self.end + n] = ts
+        self.end += n
+
+    def prune(self):
+        """Drop timestamps older than `duration` before the newest one."""
+        if self.end > self.start:
+            limit = self.buf[self.end - 1] - self.duration
+            self.start += int(np.searchsorted(self.buf[self.start:self.end], limit, side="left"))
+
+    def span(self):
+        """Seconds between the oldest and newest timestamp in the window."""
+        return float(self.buf[self.end - 1] - self.buf[self.start])
+
+class StreamContainer:
+    """Holds data and logic for a single LSL stream."""
+    def __init__(self, info):
+        self.info = info
+        self.name = info.name()
+        self.type = info.type()
+        self.source_id = info.source_id()
+        self.nominal_srate = info.nominal_srate()
+        self.channel_count = info.channel_count()
+        
+        # Unique ID for the GUI table
+        self.uid = stream_uid(info)
+        
+        self.inlet = StreamInlet(info)
+        self.state = ACTIVE
+        self.state_since = local_clock()
+        self.last_seen = self.state_since  # local_clock() when the resolver last listed the stream
+        self.recorder = None            # XdfRecorder fed from this inlet's pulls (optional)
+        self.stream_id = None
+        dtype = FORMAT_DTYPES.get(info.channel_format())
+        self.buffer = None if dtype is None else np.empty((PULL_MAX_SAMPLES, self.channel_count), dtype=dtype)
+        
+        # --- Metrics ---
+        capacity = max(MIN_WINDOW_CAPACITY, int(self.nominal_srate * WINDOW_DURATION * 1.25))
+        self.timestamps = TimestampWindow(WINDOW_DURATION, capacity)  # For sliding window calc
+        self.preview = None                # Numeric streams only
+        if self.buffer is not None:
+            rows = int(self.nominal_srate * PREVIEW_SECONDS) if self.nominal_srate > 0 else PREVIEW_MAX_SAMPLES
+            self.preview = PreviewBuffer(max(1, min(PREVIEW_MAX_SAMPLES, rows)), self.channel_count)
+        self.start_time = None          # Time of first sample received
+        self.total_samples = 0          # Total samples since connection
+        self.last_received = None       # local_clock() when samples last arrived
+
+        # --- Timing (constant memory) ---
+        self.clock_offset = None        # Latest inlet.time_correction()
+        self.clock_drift = ClockDrift()
+        self.next_clock_check = 0.0
+        self.last_chunk_ts = None       # Newest timestamp of the previous chunk
+        self.interval_p50 = P2Quantile(0.50)
+        self.interval_p99 = P2Quantile(0.99)
+        self.chunk_sizes = P2Quantile(0.50)
+        self.latency = None
+        
+        self.effective_rate = 0.0       # Last 10s
+        self.running_rate = 0.0         # Since start
+
+    def process(self):
+        """Pulls data and updates rate calculations."""
+        if self.inlet is None:
+            return
+        try:
+            # Non-blocking pull of all available data
+            ts = self.pull_timestamps()
+            
+            now = local_clock()
+            if now >= self.next_clock_check:
+                self.update_clock(now)
+
+            if ts:
+                self.last_received = now
+                self.update_timing(ts, now)
+
+                # Initialize start time if this is the first chunk
+                if self.start_time is None:
+                    self.start_time = ts[0]
+
+                # Update Counters
+                count = len(ts)
+                self.total_samples += count
+                self.timestamps.extend(ts)
+                
+                # --- Calc 1: Running Average (Since start) ---
+                # Total Samples / (Latest Timestamp - First Timestamp)
+                total_duration = ts[-1] - self.start_time
+                if total_duration > 1.0: # Avoid noise in first second
+                    self.running_rate = self.total_samples / total_duration
+
+            # --- Calc 2: Effective Rate (Sliding Window) ---
+            # Prune old timestamps
+            if len(self.timestamps):
+                self.timestamps.prune()
+
+                # Calculate based on what remains in the window
+                if len(self.timestamps) > 1:
+                    window_duration = self.timestamps.span()
+                    if window_duration > 0:
+                        self.effective_rate = len(self.timestamps) / window_duration
+                else:
+                    self.effective_rate = 0.0
+            else:
+                self.effective_rate = 0.0
+
+        except Exception:
+            self.effective_rate = 0.0
+
+    def attach_recorder(self, recorder):
+        """Record this inlet: the XDF stream header takes the full info, desc included."""
+        try:
+            info = self.inlet.info(timeout=RECORD_INFO_TIMEOUT)
+        except Exception:
+            info = self.info
+        self.stream_id = recorder.add_stream(info.as_xml())
+        self.recorder = recorder
+
+    def close(self):
+        """Stream lost: drop the subscription and free the inlet."""
+        if self.recorder is not None:
+            self.recorder.remove_stream(self.stream_id)
+            self.recorder = None
+        try:
+            self.inlet.close_stream()
+        except Exception:
+            pass
+        self.inlet = None  # pylsl destroys the inlet with its last reference
+        self.buffer = None
+        self.state = LOST
+        self.state_since = local_clock()
+        self.effective_rate = 0.0
+
+    def silent_for(self, now):
+        """Seconds since the resolver listed the stream or samples arrived, whichever is later."""
+        return now - max(self.last_seen, self.last_received or self.last_seen)
+
+    def update_clock(self, now):
+        """Read the time-correction offset; a stream without a first estimate yet is retried next cycle."""
+        try:
+            self.clock_offset = self.inlet.time_correction(timeout=CLOCK_TIMEOUT)
+        except Exception:
+            return
+        self.clock_drift.add(now, self.clock_offset)
+        if self.recorder is not None:
+            self.recorder.clock_offset(self.stream_id, now, self.clock_offset)
+        self.next_clock_check = now + CLOCK_INTERVAL
+
+    def update_timing(self, ts, now):
+        """Chunk interval, chunk size and newest-sample latency for one pulled chunk."""
+        newest = ts[-1]
+        if self.last_chunk_ts is not None:
+            interval = newest - self.last_chunk_ts
+            self.interval_p50.add(interval)
+            self.interval_p99.add(interval)
+        self.last_chunk_ts = newest
+        self.chunk_sizes.add(len(ts))
+        if self.clock_offset is not None:
+            self.latency = now - (newest + self.clock_offset)
+
+    def pull_timestamps(self):
+        """
+        Timestamps of every sample available now. Numeric data lands in
+        self.buffer; it is copied into the preview ring and, if recording,
+        handed to the recorder.
+        """
+        timestamps = []
+        while True:
+            samples, ts = self.inlet.pull_chunk(timeout=0.0, max_samples=PULL_MAX_SAMPLES, dest_obj=self.buffer)
+            timestamps.extend(ts)
+            if self.preview is not None and ts:
+                self.preview.extend(self.buffer[:len(ts)])
+            if self.recorder is not None and ts:
+                data = samples if self.buffer is None else self.buffer[:len(ts)].copy()
+                self.recorder.push(self.stream_id, ts, data)
+            if len(ts) < PULL_MAX_SAMPLES:
+                return timestamps
+
+    def snapshot(self):
+        return StreamSnapshot(self.uid, self.name, self.type, self.channel_count, self.nominal_srate,
+                              self.effective_rate, self.running_rate, self.last_received,
+                              self.state, self.state_since,
+                              self.clock_offset, self.drift_ppm(), self.interval_p50.value(),
+                              self.interval_p99.value(), self.latency, self.chunk_sizes.value(),
+                              self.chunk_sizes.max())
+
+    def preview_snapshot(self, width):
+        if self.preview is None:
+            return None
+        envelope = self.preview.decimate(width)
+        if envelope is None:
+            return None
+        samples = self.preview.count
+        seconds = samples / self.nominal_srate if self.nominal_srate > 0 else None
+        return PreviewSnapshot(self.uid, self.name, envelope[0], envelope[1], samples, seconds)
+
+    def drift_ppm(self):
+        slope = self.clock_drift.slope()
+        return None if slope is None else slope * 1e6
+
+class StreamMonitor:
+    """
+    Resolves streams and pulls their inlets on a background thread.
+
+    Each cycle runs StreamContainer.process() for all streams on a small
+    thread pool (pull_chunk releases the GIL), then replaces self.snapshot
+    with a new tuple of StreamSnapshot. Readers (GUI, metrics server) only
+    ever see a complete tuple, so they need no lock.
+
+    Every RESOLVE_INTERVAL the resolver results are diffed against the
+    known streams:
+
+        found       new uid: open an inlet
+        lost        not listed and no samples for LOST_TIMEOUT: close the inlet
+        reattached  a lost uid is listed again: new inlet, metrics restart
+        restarted   same uid from a new outlet (LSL uid changed): new inlet
+        forgotten   lost for FORGET_AFTER: removed from the list
+
+    Each transition is passed to on_transition(event, container) on the
+    monitor thread (default: print with a timestamp).
+
+    With an XdfRecorder every inlet is also recorded; stop() closes it.
+
+    The stream named by preview_uid (set by the GUI) is decimated to
+    preview_width min/max columns every PREVIEW_INTERVAL and published as
+    self.preview, a PreviewSnapshot (or None).
+    """
+    def __init__(self, on_transition=None, recorder=None):
+        self.resolver = ContinuousResolver()
+        self.streams = {}   # Map uid -> StreamContainer (monitor thread only)
+        self.snapshot = ()  # Tuple of StreamSnapshot, replaced every cycle
+        self.on_transition = on_transition or print_transition
+        self.recorder = recorder
+        self.preview_uid = None
+        self.preview_width = PREVIEW_WIDTH
+        self.preview = None
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=5.0)
+        if self.recorder is not None:
+            self.recorder.close()
+
+    def open_stream(self, info, event):
+        container = StreamContainer(info)
+        if self.recorder is not None:
+            container.attach_recorder(self.recorder)
+        self.streams[container.uid] = container
+        self.on_transition(event, container)
+
+    def update_registry(self):
+        """Diff the resolver results against the known streams (see class docstring)."""
+        now = local_clock()
+        present = {stream_uid(info): info for info in self.resolver.results()}
+
+        for uid, info in present.items():
+            container = self.streams.get(uid)
+            if container is None:
+                self.open_stream(info, "found")
+            elif container.state == LOST:
+                self.open_stream(info, "reattached")
+            elif info.uid() != container.info.uid():
+                container.close()
+                self.open_stream(info, "restarted")
+            else:
+                container.last_seen = now
+
+        for uid, container in list(self.streams.items()):
+            if container.state == LOST:
+                if now - container.state_since > FORGET_AFTER:
+                    del self.streams[uid]
+                    self.on_transition("forgotten", container)
+            elif uid not in present and container.silent_for(now) > LOST_TIMEOUT:
+                container.close()
+                self.on_transition("lost", container)
+
+    def run(self):
+        next_resolve = next_preview = 0.0
+        with ThreadPoolExecutor(PULL_WORKERS, thread_name_prefix="lsl-pull") as pool:
+            while self.running:
+                cycle_start = time.monotonic()
+                if cycle_start >= next_resolve:
+                    self.update_registry()
+                    next_resolve = cycle_start + RESOLVE_INTERVAL
+
+                containers = list(self.streams.values())
+                list(pool.map(StreamContainer.process, containers))
+                self.snapshot = tuple(c.snapshot() for c in containers)
+
+                if cycle_start >= next_preview:
+                    container = self.streams.get(self.preview_uid)
+                    self.preview = container.preview_snapshot(self.preview_width) if container else None
+                    next_preview = cycle_start + PREVIEW_INTERVAL
+
+                time.sleep(max(0.0, PULL_INTERVAL - (time.monotonic() - cycle_start)))
+
+        for container in self.streams.values():
+            if container.inlet is not None:
+                container.close()
+
+def print_transition(event, container):
+    print(f"[{time.strftime('%H:%M:%S')}] {event.upper()}: {container.name} ({container.uid})")
+
+# ==========================================
+# HEADLESS MODE
+# ==========================================
+def _round(value, digits):
+    return None if value is None else round(value, digits)
+
+def snapshot_record(s, now):
+    """One stream as a JSON-ready dict."""
+    return {
+        "uid": s.uid, "name": s.name, "type": s.type, "channels": s.channel_count,
+        "nominal_hz": s.nominal_srate, "effective_hz": round(s.effective_rate, 3),
+        "running_hz": round(s.running_rate, 3), "status": stream_status(s)[0], "state": s.state,
+        "last_sample_age_s": _round(last_sample_age(s, now), 3),
+        "clock_offset_s": _round(s.clock_offset, 6), "clock_drift_ppm": _round(s.clock_drift, 3),
+        "interval_p50_s": _round(s.interval_p50, 6), "interval_p99_s": _round(s.interval_p99, 6),
+        "latency_s": _round(s.latency, 6), "chunk_p50": _round(s.chunk_p50, 1), "chunk_max": s.chunk_max,
+    }
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def prometheus_text(snapshot, now):
+    """Current metrics in the Prometheus text exposition format."""
+    gauges = (
+        ("lsl_nominal_rate_hz", "Nominal sample rate (0 = irregular)", lambda s: s.nominal_srate),
+        ("lsl_effective_rate_hz", f"Sample rate over the last {WINDOW_DURATION:g} s", lambda s: s.effective_rate),
+        ("lsl_running_rate_hz", "Sample rate since the first sample", lambda s: s.running_rate),
+        ("lsl_last_sample_age_seconds", "Seconds since samples last arrived (NaN before the first)",
+         lambda s: last_sample_age(s, now)),
+        ("lsl_clock_offset_seconds", "inlet.time_correction() offset", lambda s: s.clock_offset),
+        ("lsl_clock_drift_ppm", "Clock offset drift over local time", lambda s: s.clock_drift),
+        ("lsl_chunk_interval_p50_seconds", "Median time between consecutive chunks", lambda s: s.interval_p50),
+        ("lsl_chunk_interval_p99_seconds", "99th percentile time between consecutive chunks",
+         lambda s: s.interval_p99),
+        ("lsl_latency_seconds", "Newest sample age at its pull (offset-corrected)", lambda s: s.latency),
+        ("lsl_chunk_size_p50", "Median samples per pulled chunk", lambda s: s.chunk_p50),
+        ("lsl_chunk_size_max", "Largest pulled chunk", lambda s: s.chunk_max),
+    )
+    labels = {s.uid: f'uid="{_label(s.uid)}",name="{_label(s.name)}",type="{_label(s.type)}"' for s in snapshot}
+    lines = ["# HELP lsl_streams Streams seen by the monitor", "# TYPE lsl_streams gauge",
+             f"lsl_streams {len(snapshot)}"]
+    for metric, help_text, value in gauges:
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+        for s in snapshot:
+            v = value(s)
+            lines.append(f"{metric}{{{labels[s.uid]}}} {'NaN' if v is None else repr(float(v))}")
+    lines += ["# HELP lsl_stream_status Current stream status (1 for the active status)",
+              "# TYPE lsl_stream_status gauge"]
+    for s in snapshot:
+        current = stream_status(s)[0]
+        for status in STATUSES:
+            lines.append(f'lsl_stream_status{{{labels[s.uid]},status="{status}"}} {int(status == current)}')
+    return "\n".join(lines) + "\n"
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    monitor = None  # Set by serve_metrics()
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text(self.monitor.snapshot, local_clock()).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep scrape requests out of the log
+
+def serve_metrics(monitor, host=METRICS_HOST, port=METRICS_PORT):
+    handler = type("BoundMetricsHandler", (MetricsHandler,), {"monitor": monitor})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def add_record_args(parser):
+    parser.add_argument("--record", default=None, help="Also record all streams to this XDF file")
+    parser.add_argument("--split-mb", type=float, default=None, help="Start a new XDF part after this many MB")
+    parser.add_argument("--split-minutes", type=float, default=None, help="Start a new XDF part after this many minutes")
+
+def make_recorder(args):
+    if not args.record:
+        return None
+    return XdfRecorder(args.record, args.split_mb, args.split_minutes)
+
+def run_headless(port=METRICS_PORT, log_path=None, interval=LOG_INTERVAL, host=METRICS_HOST, recorder=None):
+    log = open(log_path, "a", encoding="utf-8") if log_path else sys.stdout
+    log_lock = threading.Lock()  # Transitions are written from the monitor thread
+
+    def write(line):
+        with log_lock:
+            log.write(json.dumps({"time": round(time.time(), 3), "lsl_time": round(local_clock(), 3), **line},
+                                 separators=(",", ":")) + "\n")
+            log.flush()
+
+    def log_transition(event, container):
+        write({"event": event, "uid": container.uid, "name": container.name, "type": container.type})
+
+    monitor = StreamMonitor(on_transition=log_transition, recorder=recorder)
+    monitor.start()
+    server = serve_metrics(monitor, host, port) if port else None
+    if server:
+        print(f"Metrics on http://{host}:{server.server_address[1]}/metrics", file=sys.stderr)
+
+    try:
+        while True:
+            time.sleep(interval)
+            now = local_clock()
+            write({"streams": [snapshot_record(s, now) for s in monitor.snapshot]})
+    except KeyboardInterrupt:
+        print("\nStopping monitor.", file=sys.stderr)
+    finally:
+        if server:
+            server.shutdown()
+        monitor.stop()
+        if log is not sys.stdout:
+            log.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless LSL stream monitor: JSON log + Prometheus metrics")
+    parser.add_argument("--port", type=int, default=METRICS_PORT, help="Metrics HTTP port (0 = no server)")
+    parser.add_argument("--host", default=METRICS_HOST, help="Metrics bind address")
+    parser.add_argument("--log", default=None, help="Append JSON lines to this file (default: stdout)")
+    parser.add_argument("--interval", type=float, default=LOG_INTERVAL, help="Seconds between log lines")
+    add_record_args(parser)
+    args = parser.parse_args()
+    run_headless(args.port, args.log, args.interval, args.host, make_recorder(args))
@@ -0,0 +1,267 @@
+"""
+Streaming XDF writer for the LSL monitor.
+
+XdfRecorder takes the chunks the monitor already pulls from its inlets,
+so recording needs no second inlet per stream (as LabRecorder would
+open). Calls from the monitor threads only enqueue; a single writer
+thread encodes and writes the file, so memory is bounded by the queue
+(RECORD_QUEUE_CHUNKS pulled chunks; a full queue makes the monitor wait,
+and the samples stay buffered in the LSL inlets meanwhile).
+
+The file layout follows the XDF 1.0 spec as written by LabRecorder:
+
+    FileHeader, then per stream StreamHeader, Samples, ClockOffset
+    (collection time in the stream's clock, offset from
+    inlet.time_correction()), Boundary every BOUNDARY_INTERVAL and a
+    StreamFooter (first/last timestamp, sample count, clock offsets)
+
+With split_mb or split_minutes every part is a complete XDF file
+(<stem>_001.xdf, <stem>_002.xdf, ...): the next part repeats the stream
+headers and the latest clock offset of every open stream. Parts load
+with pyxdf.load_xdf like any LabRecorder file.
+
+A write error (full disk, removed directory) stops the recording, not the
+monitor: the writer records the error and exits, and from then on chunks
+are dropped instead of queued.
+"""
+import queue
+import struct
+import threading
+import time
+from pathlib import Path
+import numpy as np
+
+# ==========================================
+# RECORDER SETTINGS
+# ==========================================
+RECORD_QUEUE_CHUNKS = 4096   # Pulled chunks waiting for the writer (bounds memory)
+BOUNDARY_INTERVAL = 10.0     # Seconds between Boundary chunks (lets readers resync after damage)
+PUT_RETRY_S = 0.5            # A producer waiting on a full queue re-checks for a failed writer this often
+CLOSE_TIMEOUT = 10.0         # Seconds close() waits for the writer to finish the file
+
+# XDF chunk tags
+TAG_FILE_HEADER = 1
+TAG_STREAM_HEADER = 2
+TAG_SAMPLES = 3
+TAG_CLOCK_OFFSET = 4
+TAG_BOUNDARY = 5
+TAG_STREAM_FOOTER = 6
+BOUNDARY_UUID = bytes([0x43, 0xA5, 0x46, 0xDC, 0xCB, 0xF5, 0x41, 0x0F,
+                       0xB3, 0x0E, 0xD5, 0x46, 0x73, 0x83, 0xCB, 0xE4])
+
+def _varlen(n):
+    """XDF variable-length integer: byte count (1, 4 or 8), then the value."""
+    if n <= 0xFF:
+        return struct.pack("<BB", 1, n)
+    if n <= 0xFFFFFFFF:
+        return struct.pack("<BI", 4, n)
+    return struct.pack("<BQ", 8, n)
+
+def _chunk(tag, content):
+    return _varlen(len(content) + 2) + struct.pack("<H", tag) + content
+
+def encode_numeric(timestamps, data):
+    """Samples chunk body for a numeric stream: every sample carries its 8-byte timestamp."""
+    n, channels = data.shape
+    record = np.empty(n, dtype=[("ts_bytes", "u1"), ("ts", "<f8"),
+                                ("values", data.dtype.newbyteorder("<"), (channels,))])
+    record["ts_bytes"] = 8
+    record["ts"] = timestamps
+    record["values"] = data
+    return record.tobytes()
+
+def encode_strings(timestamps, samples):
+    parts = []
+    for t, sample in zip(timestamps, samples):
+        parts.append(struct.pack("<Bd", 8, t))
+        for value in sample:
+            raw = value.encode("utf-8") if isinstance(value, str) else bytes(value)
+            parts.append(_varlen(len(raw)))
+            parts.append(raw)
+    return b"".join(parts)
+
+class XdfRecorder:
+    """Queue-fed XDF writer thread with optional size/duration file splitting."""
+    def __init__(self, path, split_mb=None, split_minutes=None):
+        self.path = Path(path)
+        self.split_bytes = split_mb * 1024 * 1024 if split_mb else None
+        self.split_seconds = split_minutes * 60.0 if split_minutes else None
+        self.queue = queue.Queue(maxsize=RECORD_QUEUE_CHUNKS)
+        self.next_id = 1
+        self.id_lock = threading.Lock()
+        self.waits = 0           # Times a producer found the queue full
+        self.error = None        # Exception that stopped the writer thread
+        self.dropped = 0         # Items discarded after the writer failed
+
+        # Writer thread state
+        self.file = None
+        self.part = 0
+        self.streams = {}        # stream id -> {"header", "first", "last", "count", "offsets"}
+        self.thread = threading.Thread(target=self._run, name="xdf-writer", daemon=True)
+        self.thread.start()
+
+    # --- Producer side (monitor threads) ---
+    def _put(self, item):
+        if self.error is not None:
+            self.dropped += 1
+            return
+        try:
+            self.queue.put_nowait(item)
+            return
+        except queue.Full:
+            self.waits += 1
+        while True:
+            try:
+                self.queue.put(item, timeout=PUT_RETRY_S)
+                return
+            except queue.Full:
+                if self.error is not None:  # Writer died while we waited: nobody will drain the queue
+                    self.dropped += 1
+                    return
+
+    def add_stream(self, info_xml):
+        """Register a stream by its LSL info XML; returns its XDF stream id."""
+        with self.id_lock:
+            stream_id = self.next_id
+            self.next_id += 1
+        self._put(("header", stream_id, info_xml))
+        return stream_id
+
+    def push(self, stream_id, timestamps, data):
+        """One pulled chunk: data is an (n, channels) array, or a list of string samples."""
+        self._put(("samples", stream_id, timestamps, data))
+
+    def clock_offset(self, stream_id, now, offset):
+        """time_correction() result `offset`, read at local time `now`."""
+        self._put(("offset", stream_id, now - offset, offset))
+
+    def remove_stream(self, stream_id):
+        """Stream lost: write its footer now, leave it out of later parts."""
+        self._put(("remove", stream_id))
+
+    def close(self):
+        if self.error is None:
+            try:
+                self.queue.put(("close",), timeout=CLOSE_TIMEOUT)
+            except queue.Full:
+                print(f"[XDF] Writer did not drain its queue within {CLOSE_TIMEOUT:.0f} s")
+        self.thread.join(timeout=CLOSE_TIMEOUT)
+        if self.thread.is_alive():
+            print(f"[XDF] Writer still busy after {CLOSE_TIMEOUT:.0f} s; the last part may be incomplete")
+        if self.error is not None:
+            print(f"[XDF] Recording failed: {self.error!r} ({self.dropped} chunks dropped)")
+
+    # --- Writer thread ---
+    def _part_path(self):
+        if self.split_bytes is None and self.split_seconds is None:
+            return self.path
+        return self.path.with_name(f"{self.path.stem}_{self.part:03d}{self.path.suffix or '.xdf'}")
+
+    def _open_part(self):
+        self.part += 1
+        path = self._part_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(path, "wb")
+        self.part_started = time.monotonic()
+        self.next_boundary = self.part_started + BOUNDARY_INTERVAL
+        header = ('<?xml version="1.0"?><info><version>1.0</version>'
+                  f'<datetime>{time.strftime("%Y-%m-%dT%H:%M:%S%z")}</datetime></info>')
+        self.file.write(b"XDF:" + _chunk(TAG_FILE_HEADER, header.encode("utf-8")))
+        print(f"[XDF] Recording to {path}")
+
+        # Open streams continue in the new part with their header and latest clock offset
+        for stream_id, s in self.streams.items():
+            last_offset = s["offsets"][-1] if s["offsets"] else None
+            s.update(first=None, last=None, count=0, offsets=[])
+            self._write_header(stream_id, s["header"])
+            if last_offset is not None:
+                self._write_offset(stream_id, *last_offset)
+
+    def _write_header(self, stream_id, info_xml):
+        self.file.write(_chunk(TAG_STREAM_HEADER, struct.pack("<I", stream_id) + info_xml.encode("utf-8")))
+
+    def _write_offset(self, stream_id, collection_t, offset):
+        self.file.write(_chunk(TAG_CLOCK_OFFSET, struct.pack("<Idd", stream_id, collection_t, offset)))
+        self.streams[stream_id]["offsets"].append((collection_t, offset))
+
+    def _write_samples(self, stream_id, timestamps, data):
+        n = len(timestamps)
+        if isinstance(data, np.ndarray):
+            body = encode_numeric(timestamps, data)
+        else:
+            body = encode_strings(timestamps, data)
+        self.file.write(_chunk(TAG_SAMPLES, struct.pack("<I", stream_id) + _varlen(n) + body))
+        s = self.streams[stream_id]
+        if s["first"] is None:
+            s["first"] = timestamps[0]
+        s["last"] = timestamps[-1]
+        s["count"] += n
+
+    def _write_footer(self, stream_id):
+        s = self.streams[stream_id]
+        offsets = "".join(f"<offset><time>{t!r}</time><value>{v!r}</value></offset>" for t, v in s["offsets"])
+        first = float(s["first"]) if s["first"] is not None else 0.0
+        last = float(s["last"]) if s["last"] is not None else 0.0
+        footer = ('<?xml version="1.0"?><info>'
+                  f'<first_timestamp>{first!r}</first_timestamp>'
+                  f'<last_timestamp>{last!r}</last_timestamp>'
+                  f'<sample_count>{s["count"]}</sample_count>'
+                  f'<clock_offsets>{offsets}</clock_offsets></info>')
+        self.file.write(_chunk(TAG_STREAM_FOOTER, struct.pack("<I", stream_id) + footer.encode("utf-8")))
+
+    def _close_part(self):
+        for stream_id in self.streams:
+            self._write_footer(stream_id)
+        self.file.close()
+        self.file = None
+
+    def _run(self):
+        try:
+            self._write_loop()
+        except Exception as e:  # Full disk, removed path, ...: stop recording, keep the monitor running
+            self.error = e
+            print(f"[XDF] Recording stopped: {e!r}")
+            if self.file is not None:
+                try:
+                    self.file.close()
+                except OSError:
+                    pass
+                self.file = None
+            # Free the queue; producers see self.error and drop from now on
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+
+    def _write_loop(self):
+        self._open_part()
+        while True:
+            item = self.queue.get()
+            kind = item[0]
+            if kind == "close":
+                self._close_part()
+                return
+            if kind == "header":
+                _, stream_id, info_xml = item
+                self.streams[stream_id] = {"header": info_xml, "first": None, "last": None,
+                                           "count": 0, "offsets": []}
+                self._write_header(stream_id, info_xml)
+            elif kind == "samples":
+                _, stream_id, timestamps, data = item
+                if len(timestamps):
+                    self._write_samples(stream_id, timestamps, data)
+            elif kind == "offset":
+                self._write_offset(item[1], item[2], item[3])
+            elif kind == "remove":
+                self._write_footer(item[1])
+                del self.streams[item[1]]
+
+            now = time.monotonic()
+            if now >= self.next_boundary:
+                self.file.write(_chunk(TAG_BOUNDARY, BOUNDARY_UUID))
+                self.next_boundary = now + BOUNDARY_INTERVAL
+            if ((self.split_bytes is not None and self.file.tell() >= self.split_bytes)
+                    or (self.split_seconds is not None and now - self.part_started >= self.split_seconds)):
+                self._close_part()
+                self._open_part()